@@ -170,6 +170,7 @@ class MLRecommendationService {
         'temperature': weather.temperature,
         'condition': weather.condition.toString().split('.').last.toLowerCase(),
         'description': weather.description,
+        'location': weather.location, // Sabah önerilerinin önceden hesaplanması için
       },
       'userClothingItems': clothingItemsJson, // ← KULLANICININ GERÇEK KIYAFETLERİ
     };
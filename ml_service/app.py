@@ -1,13 +1,28 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import atexit
 import json
 import os
+import random
+import signal
+import threading
 from models.outfit_model import OutfitRecommender
+from models.recent_history import create_history
+from precompute import create_scheduler
+from validation import RequestValidationError, normalize_items, validate_recommend_request
 from datetime import datetime
 
 app = Flask(__name__)
 CORS(app) 
 
+# Docker'da FLASK_ENV=production: reloader yok, SIGTERM doğrudan servis sürecine gelir
+DEBUG = os.environ.get('FLASK_ENV', 'development') != 'production'
+
+# Geliştirmede `python app.py` reloader ile çalışır: ana süreç modülü yükleyip
+# sadece çocuk süreci izler, istekleri çocuk süreç (WERKZEUG_RUN_MAIN=true) karşılar.
+# Snapshot ve arka plan işleri yalnızca istekleri karşılayan süreçte çalışır.
+IS_RELOADER_PARENT = __name__ == '__main__' and DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
 # Verileri yükle
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -20,8 +35,79 @@ def load_data():
         print("Veri dosyası bulunamadı! Lütfen data_generator.py'ı çalıştırın.")
         return []
 
+# Normalize edilmiş katalog, veri dosyası değişene kadar bellekte tutulur
+_catalog_cache = {'mtime': None, 'items': []}
+
+def load_catalog_items():
+    """Katalog modu için demo kullanıcısının kıyafetleri (normalize edilmiş)"""
+    try:
+        mtime = os.path.getmtime(os.path.join(DATA_DIR, 'clothing_items.json'))
+    except OSError:
+        mtime = None
+    if mtime is not None and mtime == _catalog_cache['mtime']:
+        return _catalog_cache['items']
+    
+    all_items = load_data()
+    
+    # Tüm demo kıyafetleri kullan (sadece bir kullanıcıya ait değil)
+    if not all_items:
+        return []
+    
+    # İlk kullanıcının kıyafetlerini kullan (demo için)
+    demo_user_id = all_items[0]['userId']
+    try:
+        user_items = normalize_items([item for item in all_items if item['userId'] == demo_user_id])
+    except RequestValidationError as e:
+        print(f"❌ Katalog verisi geçersiz: {e.errors}")
+        return []
+    print(f"📦 Demo katalog kullanıcısı: {demo_user_id}, Kıyafet sayısı: {len(user_items)}")
+    
+    _catalog_cache.update(mtime=mtime, items=user_items)
+    return user_items
+
+def validation_error_response(error):
+    """Doğrulama hatalarını yapılandırılmış 400 yanıtına çevir"""
+    print(f"⚠️ Geçersiz istek: {error.errors[:3]}")
+    return jsonify({'error': 'Geçersiz istek', 'details': error.errors}), 400
+
+# Katalog (GET) isteklerinde kullanılan temsili hava durumları
+WEATHER_BANDS = {
+    'cold': 5,    # < 10°C: kış/sonbahar parçaları, dış giyim
+    'cool': 12,   # 10-15°C: ara mevsim, dış giyim
+    'mild': 17,   # 15-20°C: ara mevsim
+    'warm': 25    # >= 20°C: yaz parçaları
+}
+WEATHER_CONDITIONS = ['clear', 'rain', 'snow']
+
+# Sınırlı sayıda seed: her seed ayrı bir önbellek anahtarı, sınırsız olursa proxy_cache atlatılır
+CATALOG_SEEDS = frozenset(str(n) for n in range(100))
+
+# Katalog yanıtları kullanıcıya özel değildir; nginx ve istemciler önbelleğe alabilir
+CATALOG_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=600, stale-if-error=86400'
+
+# Kullanıcı bazlı öneri geçmişi (RECENT_HISTORY_PATH verilirse diske snapshot alınır)
+history = create_history(snapshot_path=None if IS_RELOADER_PARENT else os.environ.get('RECENT_HISTORY_PATH'))
+
+def exit_on_sigterm(signum, frame):
+    """docker stop SIGTERM gönderir; atexit kayıtlarının çalışması için normal çıkışa çevir"""
+    print("🛑 SIGTERM alındı, kapanıyor...")
+    raise SystemExit(0)
+
+if not IS_RELOADER_PARENT:
+    history.start_autosave(int(os.environ.get('RECENT_HISTORY_SNAPSHOT_INTERVAL', 300)))
+    atexit.register(history.save)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, exit_on_sigterm)
+
 # Model yükleme
-recommender = OutfitRecommender()
+recommender = OutfitRecommender(history=history)
+
+# Sabah önerilerinin önceden hesaplanması: off | thread (servis içinde) | worker (python precompute.py)
+PRECOMPUTE_MODE = os.environ.get('PRECOMPUTE_MODE', 'off')
+scheduler = create_scheduler(recommender) if PRECOMPUTE_MODE != 'off' else None
+# Birden fazla süreç (ör. servis + ayrı worker) zamanlayıcıyı başlatsa da turu depo kilidini alan tek süreç çalıştırır
+if PRECOMPUTE_MODE == 'thread' and not IS_RELOADER_PARENT:
+    scheduler.start()
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -75,17 +161,19 @@ def home():
         "endpoints": {
             "/health": "GET - API sağlık kontrolü",
             "/api/recommend": "POST - Kıyafet önerisi almak için",
-            "/api/recommend-multiple": "POST - Çoklu strateji ile kıyafet önerileri"
+            "/api/recommend-multiple": "POST - Çoklu strateji ile kıyafet önerileri",
+            "/api/catalog-recommendations": "GET - Önbelleklenebilir katalog önerileri (band, condition, strategy, seed)",
+            "/api/precompute/status": "GET - Ön hesaplama zamanlayıcısı metrikleri"
         }
     })
 
-@app.route('/api/recommend', methods=['POST'])
-def recommend_outfit():
-    data = request.json
-    user_id = data.get('userId')
-    weather = data.get('weather')
-    user_clothing_items = data.get('userClothingItems', [])
-    
+def compute_recommendation(user_id, weather, user_clothing_items):
+    """Tek öneri hesapla (doğrulanmış istek için; Flask ve ASGI yolları ortak kullanır)
+
+    (öneri, commit) döndürür. Hesaplama yan etkisizdir; geçmişe yazma commit
+    içindedir ve yalnızca yanıt gönderildikten sonra çağrılır. Süresi dolan
+    (503) istekler kullanıcının geçmişini değiştirmez.
+    """
     print(f"📥 Tek öneri isteği - Kullanıcı: {user_id}")
     print(f"👕 Flutter'dan gelen kıyafet sayısı: {len(user_clothing_items)}")
     
@@ -96,110 +184,158 @@ def recommend_outfit():
     else:
         # Katalog modu: JSON dosyasından demo kıyafetleri al (genel katalog)
         print("🏪 Katalog modu: Demo kıyafetleri kullanılıyor (genel katalog)")
-        all_items = load_data()
-        
-        # Tüm demo kıyafetleri kullan (sadece bir kullanıcıya ait değil)
-        if all_items:
-            # İlk kullanıcının kıyafetlerini kullan (demo için)
-            demo_user_id = all_items[0]['userId']
-            user_items = [item for item in all_items if item['userId'] == demo_user_id]
-            print(f"📦 Demo katalog kullanıcısı: {demo_user_id}, Kıyafet sayısı: {len(user_items)}")
-        else:
-            user_items = []
+        user_items = load_catalog_items()
     
     # Kombinleri öner
-    recommendations = recommender.recommend(user_items, weather)
+    recommendations = recommender.recommend(user_items, weather, user_id, record=False)
     
     # Debug
     print(f"✅ Öneri oluşturuldu: {len(recommendations)} kıyafet")
     
-    return jsonify(recommendations)
+    return recommendations, lambda: recommender.record_shown(user_id, [recommendations])
+
+def compute_multiple_recommendations(user_id, weather, user_clothing_items):
+    """4 farklı strateji ile çoklu öneri hesapla (doğrulanmış istek için)
+
+    (öneriler, commit) döndürür; önceden hesaplanmış sonucu tüketmek ve
+    geçmişe yazmak commit içindedir (bkz. compute_recommendation).
+    """
+    print(f"📥 Çoklu öneri isteği - Kullanıcı: {user_id}")
+    print(f"🌤️ Hava durumu: {weather}")
+    print(f"👕 Flutter'dan gelen kıyafet sayısı: {len(user_clothing_items)}")
+    
+    # Flutter'dan gelen kullanıcının gerçek kıyafetlerini kullan
+    if user_clothing_items:
+        user_items = user_clothing_items
+        print("✅ Kullanıcının gerçek kıyafetleri kullanılıyor")
+    else:
+        # Katalog modu: JSON dosyasından demo kıyafetleri al (genel katalog)
+        print("🏪 Katalog modu: Demo kıyafetleri kullanılıyor (genel katalog)")
+        user_items = load_catalog_items()
+    
+    if not user_items:
+        print("⚠️ Hiç kıyafet bulunamadı")
+        return [], lambda: None
+    
+    print(f"🎯 İşlenecek kıyafet sayısı: {len(user_items)}")
+    
+    # Kıyafet detaylarını logla
+    for i, item in enumerate(user_items[:3]):  # İlk 3 kıyafeti göster
+        print(f"  {i+1}. {item.get('name', 'İsimsiz')} - {item.get('type', 'Tip yok')}")
+    
+    # Önceden hesaplanmış sabah önerisi varsa onu kullan, kullanıcıyı aktif olarak işaretle
+    if scheduler and user_clothing_items and user_id:
+        precomputed, items_key = scheduler.lookup(user_id, weather, user_items)
+        scheduler.store.touch_user(user_id, weather.get('location'), user_items, items_key)
+        if precomputed is not None:
+            print(f"⚡ Önceden hesaplanmış öneri kullanıldı: {len(precomputed)} strateji")
+            
+            def commit_precomputed():
+                scheduler.consume(user_id)
+                recommender.record_shown(user_id, [rec['items'] for rec in precomputed])
+            
+            return precomputed, commit_precomputed
+    
+    # 4 farklı strateji ile öneriler oluştur
+    recommendations = recommender.recommend_multiple(user_items, weather, user_id, record=False)
+    
+    print(f"🎯 Toplam {len(recommendations)} strateji önerisi oluşturuldu")
+    return recommendations, lambda: recommender.record_shown(user_id, [rec['items'] for rec in recommendations])
+
+@app.route('/api/recommend', methods=['POST'])
+def recommend_outfit():
+    try:
+        user_id, weather, user_clothing_items = validate_recommend_request(request.get_json(silent=True))
+    except RequestValidationError as e:
+        return validation_error_response(e)
+    
+    recommendations, commit = compute_recommendation(user_id, weather, user_clothing_items)
+    response = jsonify(recommendations)
+    response.call_on_close(commit)
+    return response
 
 @app.route('/api/recommend-multiple', methods=['POST'])
 def recommend_multiple_outfits():
     """4 farklı strateji ile çoklu kombin önerileri"""
     try:
-        data = request.json
-        user_id = data.get('userId')
-        weather = data.get('weather')
-        user_clothing_items = data.get('userClothingItems', [])
-        
-        print(f"📥 Çoklu öneri isteği - Kullanıcı: {user_id}")
-        print(f"🌤️ Hava durumu: {weather}")
-        print(f"👕 Flutter'dan gelen kıyafet sayısı: {len(user_clothing_items)}")
+        try:
+            user_id, weather, user_clothing_items = validate_recommend_request(request.get_json(silent=True))
+        except RequestValidationError as e:
+            return validation_error_response(e)
         
-        # Flutter'dan gelen kullanıcının gerçek kıyafetlerini kullan
-        if user_clothing_items:
-            user_items = user_clothing_items
-            print("✅ Kullanıcının gerçek kıyafetleri kullanılıyor")
-        else:
-            # Katalog modu: JSON dosyasından demo kıyafetleri al (genel katalog)
-            print("🏪 Katalog modu: Demo kıyafetleri kullanılıyor (genel katalog)")
-            all_items = load_data()
-            
-            # Tüm demo kıyafetleri kullan (sadece bir kullanıcıya ait değil)
-            if all_items:
-                # İlk kullanıcının kıyafetlerini kullan (demo için)
-                demo_user_id = all_items[0]['userId']
-                user_items = [item for item in all_items if item['userId'] == demo_user_id]
-                print(f"📦 Demo katalog kullanıcısı: {demo_user_id}, Kıyafet sayısı: {len(user_items)}")
-            else:
-                user_items = []
-        
-        if not user_items:
-            print("⚠️ Hiç kıyafet bulunamadı")
-            return jsonify([])
-        
-        print(f"🎯 İşlenecek kıyafet sayısı: {len(user_items)}")
-        
-        # Kıyafet detaylarını logla
-        for i, item in enumerate(user_items[:3]):  # İlk 3 kıyafeti göster
-            print(f"  {i+1}. {item.get('name', 'İsimsiz')} - {item.get('type', 'Tip yok')}")
-        
-        # 4 farklı strateji ile öneriler oluştur
-        strategies = [
-            ('weather_focused', 'AI Hava Durumu Önerisi', 'Bugünkü hava durumuna özel AI önerisi'),
-            ('color_harmony', 'AI Renk Uyumu Önerisi', 'Renk teorisi ile uyumlu AI kombinasyonu'),
-            ('style_based', 'AI Stil Önerisi', 'Stil analizi ile oluşturulan AI önerisi'),
-            ('random_creative', 'AI Yaratıcı Önerisi', 'Yaratıcı AI algoritması ile özel kombin')
-        ]
-        
-        recommendations = []
-        
-        for strategy_name, title, description in strategies:
-            try:
-                if strategy_name == 'weather_focused':
-                    outfit = recommender._strategy_weather_focused(user_items, weather)
-                elif strategy_name == 'color_harmony':
-                    outfit = recommender._strategy_color_harmony(user_items, weather)
-                elif strategy_name == 'style_based':
-                    outfit = recommender._strategy_style_based(user_items, weather)
-                elif strategy_name == 'random_creative':
-                    outfit = recommender._strategy_random_creative(user_items, weather)
-                
-                if outfit:
-                    recommendations.append({
-                        'title': title,
-                        'description': description,
-                        'strategy': strategy_name,
-                        'items': outfit
-                    })
-                    print(f"✅ {strategy_name} stratejisi: {len(outfit)} parça")
-                else:
-                    print(f"⚠️ {strategy_name} stratejisi boş döndü")
-                    
-            except Exception as e:
-                print(f"❌ {strategy_name} stratejisi hatası: {e}")
-                continue
-        
-        print(f"🎯 Toplam {len(recommendations)} strateji önerisi oluşturuldu")
-        return jsonify(recommendations)
+        recommendations, commit = compute_multiple_recommendations(user_id, weather, user_clothing_items)
+        response = jsonify(recommendations)
+        # Geçmiş ve önceden hesaplanan sonuç yanıt gönderildikten sonra güncellenir
+        response.call_on_close(commit)
+        return response
         
     except Exception as e:
         print(f"❌ Çoklu öneri API hatası: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def catalog_response_body(recommendations):
+    """Katalog yanıt gövdesi; Flask ve ASGI yolları aynı baytları, dolayısıyla aynı ETag'i üretir"""
+    return json.dumps(recommendations, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def validate_catalog_request(args):
+    """Katalog parametrelerini doğrula: ((band, condition, strategy_name, seed), None) ya da (None, hata gövdesi)"""
+    band = args.get('band', 'mild')
+    condition = args.get('condition', 'clear')
+    strategy_name = args.get('strategy')
+    seed = args.get('seed', '0')
+    
+    if band not in WEATHER_BANDS:
+        return None, {'error': f"Geçersiz band: {band}", 'allowed': list(WEATHER_BANDS)}
+    if condition not in WEATHER_CONDITIONS:
+        return None, {'error': f"Geçersiz condition: {condition}", 'allowed': WEATHER_CONDITIONS}
+    strategy_names = [name for name, _, _ in OutfitRecommender.STRATEGIES]
+    if strategy_name is not None and strategy_name not in strategy_names:
+        return None, {'error': f"Geçersiz strateji: {strategy_name}", 'allowed': strategy_names}
+    if seed not in CATALOG_SEEDS:
+        return None, {'error': f"Geçersiz seed: {seed}", 'allowed': '0-99'}
+    return (band, condition, strategy_name, seed), None
+
+def compute_catalog_recommendations(band, condition, strategy_name, seed):
+    """Katalog önerilerini hesapla (doğrulanmış parametreler için; Flask ve ASGI yolları ortak kullanır)"""
+    print(f"📥 Katalog öneri isteği - band: {band}, durum: {condition}, strateji: {strategy_name}, seed: {seed}")
+    
+    weather = {'temperature': WEATHER_BANDS[band], 'condition': condition}
+    
+    # Aynı seed ile aynı sonuç üretilsin diye isteğe özel tohumlanmış öneri motoru
+    seeded_recommender = OutfitRecommender(
+        history=history,
+        rng=random.Random(f"{band}:{condition}:{strategy_name}:{seed}")
+    )
+    return seeded_recommender.recommend_multiple(
+        load_catalog_items(),
+        weather,
+        strategy_names=[strategy_name] if strategy_name else None
+    )
+
+@app.route('/api/catalog-recommendations', methods=['GET'])
+def catalog_recommendations():
+    """Katalog modu önerileri: aynı parametreler her zaman aynı yanıtı döndürür (önbelleklenebilir)"""
+    params, error = validate_catalog_request(request.args)
+    if error is not None:
+        return jsonify(error), 400
+    
+    response = app.response_class(
+        catalog_response_body(compute_catalog_recommendations(*params)),
+        mimetype='application/json'
+    )
+    response.headers['Cache-Control'] = CATALOG_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/precompute/status', methods=['GET'])
+def precompute_status():
+    """Ön hesaplama ilerleme metrikleri"""
+    if scheduler is None:
+        return jsonify({'status': 'disabled', 'mode': PRECOMPUTE_MODE}), 404
+    return jsonify({'status': 'enabled', 'mode': PRECOMPUTE_MODE, 'metrics': scheduler.get_metrics()})
+
 if __name__ == '__main__':
     print("🚀 Kıyafet Öneri API'si başlatılıyor...")
     print(f"📂 Veri klasörü: {DATA_DIR}")
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    app.run(debug=DEBUG, host='0.0.0.0', port=5000) 
\ No newline at end of file
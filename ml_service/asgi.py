@@ -0,0 +1,337 @@
+"""Asenkron (ASGI) servis yolu.
+
+Öneri endpoint'leri asyncio üzerinde karşılanır; CPU yoğun OutfitRecommender
+çağrıları sınırlı bir thread havuzunda çalışır. Havuz ve bekleme kuyruğu
+doluysa istek hemen 429 + Retry-After ile reddedilir, süresi (deadline) dolan
+istekler 503 + Retry-After alır. Yan etkiler (öneri geçmişi, önceden
+hesaplanan sonucun tüketilmesi) yalnızca 200 yanıtı gönderildikten sonra
+uygulanır. Katalog önerileri (GET) de aynı havuzdan geçer. /health havuzu kullanmaz, bu yüzden havuz doyduğunda da cevap verir.
+Diğer tüm yollar Flask uygulamasına (WSGI) devredilir.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import generate_etag, parse_etags, quote_etag
+
+from app import (
+    CATALOG_CACHE_CONTROL,
+    app as flask_app,
+    catalog_response_body,
+    compute_catalog_recommendations,
+    compute_multiple_recommendations,
+    compute_recommendation,
+    load_catalog_items,
+    validate_catalog_request
+)
+from validation import RequestValidationError, validate_recommend_request
+
+# Öneri hesaplaması saf Python (GIL altında) çalışır: thread sayısını artırmak
+# verimi artırmaz, sadece her isteğin süresini uzatır. 2 thread, uzun bir
+# isteğin arkasındaki kısa istekleri bekletmemeye yeter. Öneri geçmişi süreç
+# içinde tutulduğundan servis tek süreçle (uvicorn --workers 1) çalışmalı.
+MAX_WORKERS = int(os.environ.get('ASYNC_MAX_WORKERS', 2))
+MAX_QUEUE = int(os.environ.get('ASYNC_MAX_QUEUE', 64))
+DEFAULT_DEADLINE_MS = int(os.environ.get('ASYNC_REQUEST_DEADLINE_MS', 3000))
+MAX_BODY_BYTES = int(os.environ.get('ASYNC_MAX_BODY_BYTES', 1024 * 1024))
+
+
+class Overloaded(Exception):
+    """Kuyruk dolu: istek kabul edilmedi"""
+
+    def __init__(self, retry_after):
+        super().__init__('overloaded')
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """İstek süresi içinde tamamlanamadı"""
+
+    def __init__(self, retry_after):
+        super().__init__('deadline exceeded')
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Sınırlı eşzamanlılık ve kabul kontrolü ile thread havuzu
+
+    En fazla max_workers iş aynı anda çalışır, en fazla max_queue iş slot
+    bekler. Süresi dolan bir işin thread'i iptal edilemez; slotu iş gerçekten
+    bittiğinde bırakılır, böylece havuz asla aşırı yüklenmez.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommend')
+        self._slots = None
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        # İş süresinin üstel hareketli ortalaması (Retry-After tahmini için)
+        self.avg_seconds = 0.05
+
+    def retry_after(self):
+        """Kuyruğun boşalması için tahmini süre (saniye, en az 1)"""
+        backlog = self.running + self.waiting
+        return max(1, math.ceil(self.avg_seconds * backlog / self.max_workers))
+
+    def _finished(self, started):
+        self.running -= 1
+        self.completed += 1
+        self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.monotonic() - started)
+        self._slots.release()
+
+    async def run(self, deadline, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        # Kabul kontrolü: çalışan + bekleyen iş sınırı aşarsa hemen reddet
+        if self.running + self.waiting >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded(self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        # Slot alındığında süre dolmuşsa iş havuza hiç gönderilmez
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            self._slots.release()
+            self.timed_out += 1
+            raise DeadlineExceeded(self.retry_after())
+
+        self.running += 1
+        started = time.monotonic()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        future.add_done_callback(lambda _: self._finished(started))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded(self.retry_after())
+
+    def stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'running': self.running,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'avg_ms': round(self.avg_seconds * 1000, 1)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# read_body: istemci gövde gelmeden bağlantıyı kapattı
+DISCONNECTED = object()
+
+
+async def send_response(send, status, body, headers=None, include_body=True):
+    response_headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        (b'access-control-allow-origin', b'*')
+    ]
+    for name, value in (headers or {}).items():
+        response_headers.append((name.lower().encode(), str(value).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body if include_body else b''})
+
+
+async def send_json(send, status, payload, headers=None):
+    await send_response(send, status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), headers)
+
+
+async def read_body(receive, limit):
+    """İstek gövdesini oku; limit aşılırsa None, bağlantı koptuysa DISCONNECTED"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return DISCONNECTED
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def request_deadline(scope, loop):
+    """İstemci X-Request-Deadline-Ms ile daha kısa bir süre isteyebilir (varsayılanı aşamaz)"""
+    deadline_ms = DEFAULT_DEADLINE_MS
+    for name, value in scope.get('headers', []):
+        if name == b'x-request-deadline-ms':
+            try:
+                deadline_ms = min(DEFAULT_DEADLINE_MS, max(1, int(value)))
+            except ValueError:
+                pass
+            break
+    return loop.time() + deadline_ms / 1000
+
+
+class RecommendASGIApp:
+    """Öneri endpoint'lerini asyncio ile, geri kalanı Flask ile servis eden ASGI uygulaması"""
+
+    ROUTES = {
+        '/api/recommend': compute_recommendation,
+        '/api/recommend-multiple': compute_multiple_recommendations
+    }
+
+    def __init__(self, wsgi_app, max_workers=MAX_WORKERS, max_queue=MAX_QUEUE):
+        self.executor = BoundedExecutor(max_workers, max_queue)
+        self.fallback = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http':
+            path = scope['path']
+            if path == '/health' and scope['method'] == 'GET':
+                await self.health(send)
+                return
+            if path in self.ROUTES and scope['method'] == 'POST':
+                await self.recommend(scope, receive, send, self.ROUTES[path])
+                return
+            if path == '/api/catalog-recommendations' and scope['method'] in ('GET', 'HEAD'):
+                await self.catalog(scope, send)
+                return
+
+        await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                print(f"🚀 ASGI servis yolu: {self.executor.max_workers} worker, kuyruk {self.executor.max_queue}")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def health(self, send):
+        """Öneri havuzunu kullanmaz; worker'lar dolu olsa da cevap verir"""
+        stats = self.executor.stats()
+        saturated = stats['running'] >= stats['max_workers'] and stats['waiting'] >= stats['max_queue']
+        # Katalog dosyası okuması event loop'u bloklamasın
+        catalog_items = await asyncio.get_running_loop().run_in_executor(None, load_catalog_items)
+        data_status = len(catalog_items) > 0
+        await send_json(send, 200 if data_status else 503, {
+            'status': 'healthy' if data_status else 'unhealthy',
+            'message': 'API ve servisler çalışıyor' if data_status else 'Veri dosyası yüklenemedi',
+            'details': {
+                'data': 'ok' if data_status else 'missing',
+                'model': 'ok',
+                'saturated': saturated,
+                'executor': stats,
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+
+    async def recommend(self, scope, receive, send, handler):
+        loop = asyncio.get_running_loop()
+        deadline = request_deadline(scope, loop)
+
+        body = await read_body(receive, MAX_BODY_BYTES)
+        if body is DISCONNECTED:
+            return
+        if body is None:
+            await send_json(send, 413, {'error': 'İstek gövdesi çok büyük'})
+            return
+
+        # Doğrulama event loop üzerinde: hatalı istek havuza hiç girmez
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        try:
+            user_id, weather, user_clothing_items = validate_recommend_request(data)
+        except RequestValidationError as e:
+            await send_json(send, 400, {'error': 'Geçersiz istek', 'details': e.errors})
+            return
+
+        result = await self.run_in_pool(send, deadline, handler, user_id, weather, user_clothing_items)
+        if result is None:
+            return
+        recommendations, commit = result
+        await send_json(send, 200, recommendations)
+
+        # Yan etkiler (geçmiş, önceden hesaplanan sonucun tüketilmesi) yalnızca
+        # gönderilen yanıt için; süresi dolan iş bunları hiç yapmaz
+        try:
+            await loop.run_in_executor(None, commit)
+        except Exception as e:
+            print(f"❌ Öneri kaydedilemedi: {str(e)}")
+
+    async def catalog(self, scope, send):
+        """Katalog önerileri: Flask yolu ile aynı doğrulama, Cache-Control ve ETag"""
+        loop = asyncio.get_running_loop()
+        deadline = request_deadline(scope, loop)
+
+        args = {}
+        for name, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            args.setdefault(name, value)
+        params, error = validate_catalog_request(args)
+        if error is not None:
+            await send_json(send, 400, error)
+            return
+
+        result = await self.run_in_pool(send, deadline, compute_catalog_recommendations, *params)
+        if result is None:
+            return
+
+        body = catalog_response_body(result)
+        etag = generate_etag(body)
+        headers = {'Cache-Control': CATALOG_CACHE_CONTROL, 'Vary': 'Accept-Encoding', 'ETag': quote_etag(etag)}
+        for name, value in scope.get('headers', []):
+            if name == b'if-none-match' and parse_etags(value.decode('latin-1')).contains(etag):
+                await send_response(send, 304, b'', headers, include_body=False)
+                return
+        await send_response(send, 200, body, headers, include_body=scope['method'] != 'HEAD')
+
+    async def run_in_pool(self, send, deadline, fn, *args):
+        """fn'i sınırlı havuzda çalıştır; hata durumunda yanıtı gönderip None döndür"""
+        try:
+            return await self.executor.run(deadline, fn, *args)
+        except Overloaded as e:
+            print(f"🚦 Aşırı yük, istek reddedildi (Retry-After: {e.retry_after})")
+            await send_json(send, 429, {'error': 'Sunucu meşgul, lütfen tekrar deneyin'},
+                            {'Retry-After': e.retry_after})
+        except DeadlineExceeded as e:
+            print(f"⏱️ İstek süresi doldu (Retry-After: {e.retry_after})")
+            await send_json(send, 503, {'error': 'İstek zamanında tamamlanamadı'},
+                            {'Retry-After': e.retry_after})
+        except Exception as e:
+            print(f"❌ Öneri API hatası: {str(e)}")
+            await send_json(send, 500, {'error': str(e)})
+        return None
+
+
+application = RecommendASGIApp(flask_app)
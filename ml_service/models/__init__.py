@@ -1,5 +1,6 @@
 # Bu dosya models klasörünü bir Python modülü yapar 
 
 from .outfit_model import OutfitRecommender
+from .recent_history import RecentOutfitHistory
 
-__all__ = ['OutfitRecommender'] 
\ No newline at end of file
+__all__ = ['OutfitRecommender', 'RecentOutfitHistory'] 
\ No newline at end of file
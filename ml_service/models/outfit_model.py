@@ -4,17 +4,47 @@ import json
 import os
 import pickle
 import random
-from datetime import datetime
+
+from .recent_history import RecentOutfitHistory
+
+# Geçmişi olmayan istekler için: (son gösterilen parmak izleri, son gösterilen kıyafetlerin id() kümesi)
+NO_RECENT = (frozenset(), frozenset())
 
 class OutfitRecommender:
-    def __init__(self, model_path=None):
+    """Kombin öneri motoru.
+
+    Girdi API sınırında (validation.py) normalize edilmiş kabul edilir: renkler ve
+    hava durumu koşulu küçük harf, tip/mevsim değerleri geçerli enum değerleri.
+    """
+    
+    # Çoklu öneri stratejileri: (ad, başlık, açıklama)
+    STRATEGIES = [
+        ('weather_focused', 'AI Hava Durumu Önerisi', 'Bugünkü hava durumuna özel AI önerisi'),
+        ('color_harmony', 'AI Renk Uyumu Önerisi', 'Renk teorisi ile uyumlu AI kombinasyonu'),
+        ('style_based', 'AI Stil Önerisi', 'Stil analizi ile oluşturulan AI önerisi'),
+        ('random_creative', 'AI Yaratıcı Önerisi', 'Yaratıcı AI algoritması ile özel kombin')
+    ]
+    
+    # Yakın zamanda gösterilen parçalar elenmez, geri plana atılır:
+    # skorlu seçimlerde skordan düşülür, rastgele seçimlerde ağırlığı azalır
+    RECENT_PENALTY = 2
+    RECENT_WEIGHT = 0.25
+    
+    def __init__(self, model_path=None, history=None, rng=None):
         self.model = self._create_new_model()
-        self.last_recommendations = []
+        self.history = history if history is not None else RecentOutfitHistory(max_users=1024)
+        # Tohumlanmış bir random.Random verilirse öneriler tekrarlanabilir olur
+        self.rng = rng if rng is not None else random.Random()
         
     def _create_new_model(self):
         return {'vectors': {}, 'clusters': {}}
         
-    def recommend(self, user_items, weather):
+    def recommend(self, user_items, weather, user_id=None, record=True):
+        """Rastgele bir stratejiyle tek kombin öner
+
+        record=False ise geçmiş okunur ama yazılmaz; çağıran, yanıt gerçekten
+        gönderildiğinde record_shown ile yazar.
+        """
         if not user_items:
             print("⚠️ Kullanıcının kıyafeti bulunamadı!")
             return []
@@ -30,24 +60,67 @@ class OutfitRecommender:
             self._strategy_random_creative
         ]
         
-        selected_strategy = random.choice(strategies)
+        selected_strategy = self.rng.choice(strategies)
         print(f"🎯 Seçilen strateji: {selected_strategy.__name__}")
         
-        outfit = selected_strategy(user_items, weather)
-        
-        self.last_recommendations.append({
-            'strategy': selected_strategy.__name__,
-            'timestamp': datetime.now().isoformat(),
-            'outfit_count': len(outfit)
-        })
+        outfit = selected_strategy(user_items, weather, self.recent_for(user_id, user_items))
         
-        if len(self.last_recommendations) > 10:
-            self.last_recommendations = self.last_recommendations[-10:]
+        if record:
+            self.record_shown(user_id, [outfit])
         
         print(f"✅ Kombin oluşturuldu: {len(outfit)} parça")
         return outfit
     
-    def _strategy_weather_focused(self, user_items, weather):
+    def recommend_multiple(self, user_items, weather, user_id=None, strategy_names=None, record=True):
+        """Verilen stratejilerle (varsayılan: hepsi) kombin önerileri oluştur
+
+        Geçmiş istek başına bir kez okunur. record=False ise yazılmaz (ön
+        hesaplama ve yanıtı sonradan gönderen yollar için).
+        """
+        recommendations = []
+        recent = self.recent_for(user_id, user_items)
+        
+        for strategy_name, title, description in self.STRATEGIES:
+            if strategy_names and strategy_name not in strategy_names:
+                continue
+            try:
+                strategy = getattr(self, f'_strategy_{strategy_name}')
+                outfit = strategy(user_items, weather, recent)
+                
+                if outfit:
+                    recommendations.append({
+                        'title': title,
+                        'description': description,
+                        'strategy': strategy_name,
+                        'items': outfit
+                    })
+                    print(f"✅ {strategy_name} stratejisi: {len(outfit)} parça")
+                else:
+                    print(f"⚠️ {strategy_name} stratejisi boş döndü")
+                    
+            except Exception as e:
+                print(f"❌ {strategy_name} stratejisi hatası: {e}")
+                continue
+        
+        # Stratejiler birbirinin parçalarını geri plana atmasın: geçmiş yanıt başına bir kez yazılır
+        if record:
+            self.record_shown(user_id, [rec['items'] for rec in recommendations])
+        
+        return recommendations
+    
+    def recent_for(self, user_id, user_items):
+        """Kullanıcının yakın zamanda gördükleri: (parmak izleri, user_items içindeki id() kümesi)"""
+        keys = self.history.recent_keys(user_id)
+        if not keys:
+            return NO_RECENT
+        return keys, self.history.recent_items(keys, user_items)
+    
+    def record_shown(self, user_id, outfits):
+        """Kullanıcıya gösterilen kombinleri geçmişe yaz (aksesuarlar hariç ana parçalar)"""
+        items = [item for outfit in outfits for item in outfit if item and not self._is_accessory(item)]
+        self.history.record(user_id, outfits, items)
+    
+    def _strategy_weather_focused(self, user_items, weather, recent=NO_RECENT):
         """Hava durumu odaklı strateji"""
         print("🌤️ Hava durumu odaklı strateji")
         
@@ -55,9 +128,9 @@ class OutfitRecommender:
         if not suitable_items:
             suitable_items = user_items
         
-        return self._build_complete_outfit(suitable_items, weather, 'weather')
+        return self._build_complete_outfit(suitable_items, weather, 'weather', recent=recent)
     
-    def _strategy_color_harmony(self, user_items, weather):
+    def _strategy_color_harmony(self, user_items, weather, recent=NO_RECENT):
         """Renk uyumu odaklı strateji"""
         print("🎨 Renk uyumu odaklı strateji")
         
@@ -65,14 +138,14 @@ class OutfitRecommender:
         if not suitable_items:
             suitable_items = user_items
         
-        return self._build_complete_outfit(suitable_items, weather, 'color')
+        return self._build_complete_outfit(suitable_items, weather, 'color', recent=recent)
     
-    def _strategy_style_based(self, user_items, weather):
+    def _strategy_style_based(self, user_items, weather, recent=NO_RECENT):
         """Stil bazlı strateji"""
         print("👔 Stil bazlı strateji")
         
         styles = ['casual', 'formal', 'sporty']
-        target_style = random.choice(styles)
+        target_style = self.rng.choice(styles)
         print(f"🎯 Hedef stil: {target_style}")
         
         suitable_items = self._filter_by_weather(user_items, weather)
@@ -83,9 +156,9 @@ class OutfitRecommender:
         if not style_items:
             style_items = suitable_items
             
-        return self._build_complete_outfit(style_items, weather, 'style', target_style)
+        return self._build_complete_outfit(style_items, weather, 'style', target_style, recent=recent)
     
-    def _strategy_random_creative(self, user_items, weather):
+    def _strategy_random_creative(self, user_items, weather, recent=NO_RECENT):
         """Yaratıcı rastgele strateji"""
         print("🎲 Yaratıcı rastgele strateji")
         
@@ -93,11 +166,26 @@ class OutfitRecommender:
         if not suitable_items:
             suitable_items = user_items
             
-        return self._build_complete_outfit(suitable_items, weather, 'creative')
+        return self._build_complete_outfit(suitable_items, weather, 'creative', recent=recent)
     
-    def _build_complete_outfit(self, items, weather, strategy_type, style=None):
+    def _build_complete_outfit(self, items, weather, strategy_type, style=None, recent=NO_RECENT):
         """Tüm kıyafet tiplerini destekleyen kombin oluşturucu"""
         
+        # Kullanıcıya yakın zamanda gösterilen parçalar ve kombinler
+        recent_keys, recent_items = recent
+        
+        outfit = self._assemble_outfit(items, weather, strategy_type, style, recent_items)
+        
+        # Aynı kombin yakın zamanda gösterildiyse bir kez daha dene
+        if recent_keys and self.history.outfit_key(outfit) in recent_keys:
+            print("🔁 Kombin yakın zamanda gösterilmiş, yeniden deneniyor")
+            outfit = self._assemble_outfit(items, weather, strategy_type, style, recent_items)
+        
+        return outfit
+    
+    def _assemble_outfit(self, items, weather, strategy_type, style, recent_items):
+        """Kategorilere ayırıp parçaları seç (yakın zamanda gösterilenler geri planda)"""
+        
         # Kategorilere ayır
         dresses = [item for item in items if self._is_dress(item)]
         tops = [item for item in items if self._is_top(item)]
@@ -111,41 +199,41 @@ class OutfitRecommender:
         outfit = []
         
         # 1. Ana parça seçimi (Elbise vs Normal kombin)
-        if dresses and (strategy_type == 'creative' and random.random() < 0.4 or len(tops) == 0 or len(bottoms) == 0):
+        if dresses and (strategy_type == 'creative' and self.rng.random() < 0.4 or len(tops) == 0 or len(bottoms) == 0):
             # Elbise seç
-            dress = self._select_item_by_strategy(dresses, weather, strategy_type, style)
+            dress = self._select_item_by_strategy(dresses, weather, strategy_type, style, recent_items)
             outfit.append(dress)
             print(f"👗 Elbise seçildi: {dress['name']}")
         else:
             # Normal kombin: üst + alt
             if tops:
-                top = self._select_item_by_strategy(tops, weather, strategy_type, style)
+                top = self._select_item_by_strategy(tops, weather, strategy_type, style, recent_items)
                 outfit.append(top)
                 print(f"👕 Üst giyim: {top['name']}")
                 
             if bottoms:
                 if strategy_type == 'color' and outfit:
-                    bottom = self._find_color_matching_item(outfit[0], bottoms)
+                    bottom = self._find_color_matching_item(outfit[0], bottoms, recent_items)
                 else:
-                    bottom = self._select_item_by_strategy(bottoms, weather, strategy_type, style)
+                    bottom = self._select_item_by_strategy(bottoms, weather, strategy_type, style, recent_items)
                 outfit.append(bottom)
                 print(f"👖 Alt giyim: {bottom['name']}")
         
         # 2. Ayakkabı ekle
         if shoes:
             if strategy_type == 'color' and outfit:
-                shoe = self._find_color_matching_item(outfit[0], shoes)
+                shoe = self._find_color_matching_item(outfit[0], shoes, recent_items)
             else:
-                shoe = self._select_item_by_strategy(shoes, weather, strategy_type, style)
+                shoe = self._select_item_by_strategy(shoes, weather, strategy_type, style, recent_items)
             outfit.append(shoe)
             print(f"👞 Ayakkabı: {shoe['name']}")
         
         # 3. Dış giyim (hava durumuna göre)
         if self._needs_outerwear(weather) and outerwear:
             if strategy_type == 'color' and outfit:
-                outer = self._find_neutral_or_matching(outfit, outerwear)
+                outer = self._find_neutral_or_matching(outfit, outerwear, recent_items)
             else:
-                outer = self._select_item_by_strategy(outerwear, weather, strategy_type, style)
+                outer = self._select_item_by_strategy(outerwear, weather, strategy_type, style, recent_items)
             outfit.append(outer)
             print(f"🧥 Dış giyim: {outer['name']}")
         
@@ -158,25 +246,32 @@ class OutfitRecommender:
         
         return outfit
     
-    def _select_item_by_strategy(self, items, weather, strategy_type, style=None):
+    def _select_item_by_strategy(self, items, weather, strategy_type, style=None, recent_items=frozenset()):
         """Stratejiye göre kıyafet seç"""
         if not items:
             return None
             
         if strategy_type == 'weather':
-            return self._select_weather_appropriate(items, weather)
+            return self._select_weather_appropriate(items, weather, recent_items)
         elif strategy_type == 'color':
             # Renk stratejisi için renkli kıyafetleri tercih et
             colorful_items = [item for item in items if len(item['colors']) > 0]
-            return random.choice(colorful_items if colorful_items else items)
+            return self._choose(colorful_items if colorful_items else items, recent_items)
         elif strategy_type == 'style':
-            return self._select_style_appropriate(items, style, weather)
+            return self._select_style_appropriate(items, style, weather, recent_items)
         elif strategy_type == 'creative':
-            return random.choice(items)
+            return self._choose(items, recent_items)
         else:
-            return random.choice(items)
+            return self._choose(items, recent_items)
+    
+    def _choose(self, items, recent_items):
+        """Rastgele seç; yakın zamanda gösterilenlerin ağırlığı RECENT_WEIGHT"""
+        if not recent_items:
+            return self.rng.choice(items)
+        weights = [self.RECENT_WEIGHT if id(item) in recent_items else 1 for item in items]
+        return self.rng.choices(items, weights=weights)[0]
     
-    def _select_weather_appropriate(self, items, weather):
+    def _select_weather_appropriate(self, items, weather, recent_items=frozenset()):
         """Hava durumuna en uygun kıyafeti seç"""
         temperature = weather['temperature']
         scored_items = []
@@ -204,6 +299,10 @@ class OutfitRecommender:
             # Mevsim bonus
             if 'all' in item['seasons']:
                 score += 1
+            
+            # Yakın zamanda gösterildiyse geri plana at
+            if id(item) in recent_items:
+                score -= self.RECENT_PENALTY
                 
             scored_items.append((item, score))
         
@@ -211,9 +310,9 @@ class OutfitRecommender:
         max_score = scored_items[0][1]
         best_items = [item for item, score in scored_items if score == max_score]
         
-        return random.choice(best_items)
+        return self.rng.choice(best_items)
     
-    def _select_style_appropriate(self, items, style, weather):
+    def _select_style_appropriate(self, items, style, weather, recent_items=frozenset()):
         """Stile uygun kıyafet seç"""
         style_mapping = {
             'casual': ['tShirt', 'jeans', 'shorts', 'shoes', 'jacket', 'accessory', 'hat'],
@@ -225,9 +324,9 @@ class OutfitRecommender:
         style_items = [item for item in items if item['type'] in suitable_types]
         
         if style_items:
-            return self._select_weather_appropriate(style_items, weather)
+            return self._select_weather_appropriate(style_items, weather, recent_items)
         else:
-            return self._select_weather_appropriate(items, weather)
+            return self._select_weather_appropriate(items, weather, recent_items)
     
     def _select_accessories(self, accessories, weather, strategy_type, style, outfit):
         """Aksesuar seçimi - Aksesuar varsa mutlaka ekle!"""
@@ -241,13 +340,13 @@ class OutfitRecommender:
         
         selected = []
         temperature = weather['temperature']
-        condition = weather['condition'].lower()
+        condition = weather['condition']
         
         print(f"🌡️ Sıcaklık: {temperature}°C, Durum: {condition}, Stil: {style}")
         
         # TEMEL KURAL: Her durumda en az 1 aksesuar ekle!
         print("✨ Temel aksesuar ekleniyor...")
-        selected.append(random.choice(accessories))
+        selected.append(self.rng.choice(accessories))
         print(f"✅ Temel aksesuar: {selected[-1]['name']} eklendi")
         
         # BONUS: Hava durumuna göre ek aksesuarlar
@@ -255,27 +354,27 @@ class OutfitRecommender:
             # Soğukta şapka/bere/atkı
             warm_accessories = [item for item in accessories if item['type'] in ['hat', 'scarf'] and item not in selected]
             if warm_accessories:
-                selected.append(random.choice(warm_accessories))
+                selected.append(self.rng.choice(warm_accessories))
                 print(f"🧣 Soğuk hava bonus: {selected[-1]['name']} eklendi")
         
         # BONUS: Yağmurlu havada şapka
         if 'rain' in condition:
             hats = [item for item in accessories if item['type'] == 'hat' and item not in selected]
             if hats:
-                selected.append(random.choice(hats))
+                selected.append(self.rng.choice(hats))
                 print(f"☔ Yağmur bonus: {selected[-1]['name']} eklendi")
         
         # BONUS: Yaratıcı modda 2. aksesuar
-        if strategy_type == 'creative' and len(accessories) > 1 and random.random() < 0.6:
+        if strategy_type == 'creative' and len(accessories) > 1 and self.rng.random() < 0.6:
             remaining = [acc for acc in accessories if acc not in selected]
             if remaining:
-                selected.append(random.choice(remaining))
+                selected.append(self.rng.choice(remaining))
                 print(f"🎨 Yaratıcı bonus: {selected[-1]['name']} eklendi")
         
         print(f"✅ Toplam {len(selected)} aksesuar seçildi")
         return selected
     
-    def _find_color_matching_item(self, reference_item, candidates):
+    def _find_color_matching_item(self, reference_item, candidates, recent_items=frozenset()):
         """Renk uyumlu kıyafet bul"""
         if not candidates:
             return None
@@ -285,14 +384,16 @@ class OutfitRecommender:
         
         for item in candidates:
             score = self._calculate_color_match(ref_colors, item['colors'])
+            if id(item) in recent_items:
+                score -= self.RECENT_PENALTY
             scored_items.append((item, score))
         
         scored_items.sort(key=lambda x: x[1], reverse=True)
         top_candidates = scored_items[:min(3, len(scored_items))]
         
-        return random.choice([item for item, _ in top_candidates])
+        return self.rng.choice([item for item, _ in top_candidates])
     
-    def _find_neutral_or_matching(self, outfit, candidates):
+    def _find_neutral_or_matching(self, outfit, candidates, recent_items=frozenset()):
         """Nötr veya uyumlu renk bul"""
         if not candidates:
             return None
@@ -301,14 +402,14 @@ class OutfitRecommender:
         neutral_items = []
         for item in candidates:
             for color in item['colors']:
-                if color.lower() in ['#000000', '#ffffff', '#808080', '#c0c0c0']:
+                if color in ['#000000', '#ffffff', '#808080', '#c0c0c0']:
                     neutral_items.append(item)
                     break
         
         if neutral_items:
-            return random.choice(neutral_items)
+            return self._choose(neutral_items, recent_items)
         else:
-            return self._find_color_matching_item(outfit[0], candidates)
+            return self._find_color_matching_item(outfit[0], candidates, recent_items)
     
     def _calculate_color_match(self, colors1, colors2):
         """Renk uyumu hesapla"""
@@ -319,9 +420,9 @@ class OutfitRecommender:
         
         for c1 in colors1:
             for c2 in colors2:
-                if c1.lower() == c2.lower():
+                if c1 == c2:
                     match_score += 5
-                elif c1.lower() in ['#000000', '#ffffff', '#808080'] or c2.lower() in ['#000000', '#ffffff', '#808080']:
+                elif c1 in ['#000000', '#ffffff', '#808080'] or c2 in ['#000000', '#ffffff', '#808080']:
                     match_score += 3
                 else:
                     match_score += 1
@@ -359,7 +460,7 @@ class OutfitRecommender:
     def _needs_outerwear(self, weather):
         """Dış giyim gerekiyor mu?"""
         temperature = weather['temperature']
-        condition = weather['condition'].lower()
+        condition = weather['condition']
         
         return temperature < 15 or any(c in condition for c in ['rain', 'snow', 'storm'])
     
@@ -0,0 +1,252 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+
+
+class RecentOutfitHistory:
+    """Kullanıcı bazlı son gösterilen kıyafet/kombin geçmişi.
+
+    Tüm kullanıcılar önceden ayrılmış tek bir bellek bloğunda (slab) tutulur;
+    kullanıcı başına Python nesnesi oluşturulmaz. Kullanıcı kimliği 64 bit'lik
+    bir hash'e indirgenir ve açık adresli bir tabloda (probe_window kadar
+    doğrusal arama) bir slota yerleştirilir. Her slotta ring_size elemanlı bir
+    halka vardır; her eleman 16 bit'lik kıyafet/kombin parmak izi ve 32 bit'lik
+    dakika cinsinden zaman damgasıdır (Unix epoch'tan beri, başa dönmez).
+
+    Bellek: kullanıcı başına 13 + 6 * ring_size bayt (ring_size=48 için ~300 bayt,
+    1M kullanıcı ~300 MB). Tablo dolduğunda arama penceresindeki en uzun
+    süredir görülmeyen kullanıcı atılır.
+    """
+
+    # Snapshot formatı; dizi tipleri değişirse artırılır, eski snapshot yok sayılır
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, ring_size=48, ttl_seconds=3 * 24 * 3600, max_users=100_000, snapshot_path=None,
+                 probe_window=8):
+        if not 0 < ring_size <= 255:
+            raise ValueError("ring_size 1-255 arasında olmalı")
+
+        self.ring_size = ring_size
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self.snapshot_path = snapshot_path
+        self.probe_window = min(probe_window, max_users)
+        self._ttl_minutes = ttl_seconds // 60
+        self._lock = threading.Lock()
+        self._autosave_stop = None
+
+        self._uids = array('Q', bytes(8 * max_users))          # 0 = boş slot
+        self._touched = array('I', bytes(4 * max_users))       # son erişim (dakika)
+        self._heads = array('B', bytes(max_users))
+        self._keys = array('H', bytes(2 * max_users * ring_size))
+        self._times = array('I', bytes(4 * max_users * ring_size))
+
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    @staticmethod
+    def _now_minutes():
+        return int(time.time() // 60)
+
+    @staticmethod
+    def _user_hash(user_id):
+        digest = hashlib.blake2b(str(user_id).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    @staticmethod
+    def _fold(value):
+        """32 bit hash'i sıfırdan farklı 16 bit parmak izine indir (0 = boş eleman)"""
+        return ((value ^ (value >> 16)) & 0xFFFF) or 1
+
+    @classmethod
+    def item_key(cls, item):
+        """Kıyafet kimliğinin 16 bit'lik kararlı parmak izi"""
+        item_id = item.get('id') or item.get('name') or ''
+        return cls._fold(zlib.crc32(str(item_id).encode('utf-8')))
+
+    @classmethod
+    def outfit_key(cls, outfit):
+        """Kombin parmak izi: parça kimliklerinin sırasız birleşimi"""
+        ids = sorted(str(item.get('id') or item.get('name') or '') for item in outfit if item)
+        return cls._fold(zlib.crc32('\x1f'.join(ids).encode('utf-8'))) if ids else 0
+
+    def _find_slot(self, uid):
+        start = uid % self.max_users
+        for i in range(self.probe_window):
+            slot = (start + i) % self.max_users
+            if self._uids[slot] == uid:
+                return slot
+        return None
+
+    def _claim_slot(self, uid, now):
+        """Boş, süresi dolmuş ya da pencerede en eski slotu kullanıcıya ata"""
+        start = uid % self.max_users
+        victim = None
+        victim_age = -1
+        for i in range(self.probe_window):
+            slot = (start + i) % self.max_users
+            if self._uids[slot] == 0:
+                victim = slot
+                break
+            age = now - self._touched[slot]
+            if age > victim_age:
+                victim, victim_age = slot, age
+
+        base = victim * self.ring_size
+        self._uids[victim] = uid
+        self._heads[victim] = 0
+        self._keys[base:base + self.ring_size] = array('H', bytes(2 * self.ring_size))
+        self._times[base:base + self.ring_size] = array('I', bytes(4 * self.ring_size))
+        return victim
+
+    def recent_keys(self, user_id):
+        """TTL süresi dolmamış parmak izlerinin kümesi"""
+        if user_id is None:
+            return frozenset()
+
+        uid = self._user_hash(user_id)
+        now = self._now_minutes()
+        ttl = self._ttl_minutes
+        with self._lock:
+            slot = self._find_slot(uid)
+            if slot is None:
+                return frozenset()
+            base = slot * self.ring_size
+            keys = self._keys[base:base + self.ring_size]
+            times = self._times[base:base + self.ring_size]
+        return frozenset(key for key, ts in zip(keys, times) if key and now - ts <= ttl)
+
+    def recent_items(self, keys, items):
+        """keys içinde parmak izi olan kıyafetlerin id() kümesi
+
+        İstek başına bir kez hesaplanır; seçiciler parmak izini tekrar
+        hesaplamadan `id(item) in recent_items` ile kontrol eder.
+        """
+        if not keys:
+            return frozenset()
+        item_key = self.item_key
+        return frozenset(id(item) for item in items if item_key(item) in keys)
+
+    def record(self, user_id, outfits, items):
+        """Bir yanıtta gösterilen kombinleri ve parçaları kullanıcının halkasına ekle
+
+        Yanıt başına bir kez çağrılır: her kombin için bir kombin parmak izi ve
+        verilen parçaların (tekilleştirilmiş) parmak izleri yazılır.
+        """
+        if user_id is None or not outfits:
+            return
+
+        keys = []
+        for outfit in outfits:
+            key = self.outfit_key(outfit)
+            if key and key not in keys:
+                keys.append(key)
+        for item in items:
+            key = self.item_key(item)
+            if key not in keys:
+                keys.append(key)
+        keys = keys[-self.ring_size:]
+
+        uid = self._user_hash(user_id)
+        now = self._now_minutes()
+        n = self.ring_size
+        with self._lock:
+            slot = self._find_slot(uid)
+            if slot is None:
+                slot = self._claim_slot(uid, now)
+            self._touched[slot] = now
+
+            base = slot * n
+            head = self._heads[slot]
+            for key in keys:
+                self._keys[base + head] = key
+                self._times[base + head] = now
+                head = (head + 1) % n
+            self._heads[slot] = head
+
+    def save(self, path=None):
+        """Geçmişi diske yaz (benzersiz geçici dosya + atomik rename)"""
+        path = path or self.snapshot_path
+        if not path:
+            return
+
+        with self._lock:
+            payload = {
+                'version': self.SNAPSHOT_VERSION,
+                'ring_size': self.ring_size,
+                'max_users': self.max_users,
+                'uids': self._uids.tobytes(),
+                'touched': self._touched.tobytes(),
+                'heads': self._heads.tobytes(),
+                'keys': self._keys.tobytes(),
+                'times': self._times.tobytes()
+            }
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        print(f"💾 Öneri geçmişi kaydedildi: {len(self)} kullanıcı")
+
+    def load(self, path=None):
+        """Diskteki geçmişi yükle; boyutlar değiştiyse snapshot yok sayılır"""
+        path = path or self.snapshot_path
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"⚠️ Öneri geçmişi yüklenemedi: {e}")
+            return
+
+        if payload.get('version') != self.SNAPSHOT_VERSION:
+            print("⚠️ Öneri geçmişi snapshot formatı eski, snapshot atlandı")
+            return
+        if payload.get('ring_size') != self.ring_size or payload.get('max_users') != self.max_users:
+            print("⚠️ Öneri geçmişi boyutları uyuşmuyor, snapshot atlandı")
+            return
+
+        with self._lock:
+            for name in ('uids', 'touched', 'heads', 'keys', 'times'):
+                arr = getattr(self, f'_{name}')
+                loaded = array(arr.typecode)
+                loaded.frombytes(payload[name])
+                setattr(self, f'_{name}', loaded)
+        print(f"📂 Öneri geçmişi yüklendi: {len(self)} kullanıcı")
+
+    def start_autosave(self, interval_seconds):
+        """Geçmişi arka planda periyodik olarak diske yaz"""
+        if not self.snapshot_path or interval_seconds <= 0 or self._autosave_stop is not None:
+            return
+        self._autosave_stop = threading.Event()
+
+        def _autosave():
+            while not self._autosave_stop.wait(interval_seconds):
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"❌ Öneri geçmişi kaydedilemedi: {e}")
+
+        threading.Thread(target=_autosave, name='history-autosave', daemon=True).start()
+
+    def __len__(self):
+        return self.max_users - self._uids.count(0)
+
+
+def create_history(snapshot_path=None):
+    """RECENT_HISTORY_* ortam değişkenlerinden geçmiş oluştur (servis ve worker aynı boyutları kullanır)"""
+    return RecentOutfitHistory(
+        ring_size=int(os.environ.get('RECENT_HISTORY_RING_SIZE', 48)),
+        ttl_seconds=int(os.environ.get('RECENT_HISTORY_TTL_SECONDS', 3 * 24 * 3600)),
+        max_users=int(os.environ.get('RECENT_HISTORY_MAX_USERS', 100_000)),
+        snapshot_path=snapshot_path
+    )
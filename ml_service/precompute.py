@@ -0,0 +1,537 @@
+"""Sabah önerilerinin önceden hesaplanması.
+
+Sabah saatlerinde tüm kullanıcılar uygulamayı aynı anda açtığı için her açılış
+tam bir öneri hesaplaması tetikliyor. Bu modül, aktif kullanıcıların
+``recommend-multiple`` sonuçlarını yoğun olmayan saatlerde, şehirlerinin hava
+tahminiyle önceden hesaplayıp yerel bir SQLite deposuna yazar. API isteği
+önce depoya bakar, bulamazsa canlı hesaplamaya düşer.
+
+Servis içinde thread olarak (PRECOMPUTE_MODE=thread) ya da ayrı bir worker
+olarak çalıştırılabilir:
+
+    python precompute.py            # her gün PRECOMPUTE_HOUR'da çalışır
+    python precompute.py --once     # tek seferlik çalıştırma
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+
+from validation import normalize_weather
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def weather_band(weather):
+    """Normalize edilmiş hava durumunu öneri eşiklerine göre kaba bir anahtara indirger (ör. 'cold:rain')"""
+    temperature = weather['temperature']
+    condition = weather['condition']
+
+    if temperature < 10:
+        band = 'cold'
+    elif temperature < 15:
+        band = 'cool'
+    elif temperature < 20:
+        band = 'mild'
+    else:
+        band = 'warm'
+
+    if 'snow' in condition:
+        group = 'snow'
+    elif 'rain' in condition or 'storm' in condition:
+        group = 'rain'
+    else:
+        group = 'clear'
+
+    return f"{band}:{group}"
+
+
+def wardrobe_key(user_items):
+    """Gardırop içeriğinin parmak izi; kıyafet eklenir/değişirse önceden hesaplanan sonuç geçersiz olur"""
+    payload = json.dumps(user_items, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_city(city):
+    """Şehir adını karşılaştırma anahtarına indirger: 'İstanbul', 'ISTANBUL', 'istanbul' -> 'istanbul'
+
+    Python'da 'İ'.lower() birleşik noktalı 'i̇' verir; Türkçe harfler önce
+    eşlenir, sonra aksan işaretleri atılır ('Muğla' -> 'mugla').
+    """
+    city = city.strip().replace('İ', 'i').replace('ı', 'i').lower()
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', city) if not unicodedata.combining(ch))
+
+
+def target_date(now=None):
+    """Sabahı sıradaki gün (gece yarısından sonra bugün, akşam ise yarın)"""
+    now = now or datetime.now()
+    return (now + timedelta(hours=12)).date().isoformat()
+
+
+class WeatherProvider:
+    """Şehir bazlı hava tahmini sağlayıcısı"""
+
+    def get_forecast(self, city, date):
+        """{'temperature': float, 'condition': str} ya da bilinmiyorsa None döndürür"""
+        raise NotImplementedError
+
+
+class FileWeatherProvider(WeatherProvider):
+    """JSON dosyasından hava tahmini (testler ve yerel geliştirme için)
+
+    Dosya formatı (şehir adları normalize_city ile eşleştirilir):
+        {"istanbul": {"temperature": 14, "condition": "rain"},
+         "ankara": {"2024-11-02": {"temperature": 3, "condition": "snow"}}}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._forecasts = None
+        self._mtime = None
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            print(f"⚠️ Hava tahmini dosyası bulunamadı: {self.path}")
+            return {}
+
+        if mtime != self._mtime:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._forecasts = {normalize_city(city): value for city, value in json.load(f).items()}
+            self._mtime = mtime
+        return self._forecasts
+
+    def get_forecast(self, city, date):
+        entry = self._load().get(normalize_city(city))
+        if not entry:
+            return None
+        if 'temperature' in entry:
+            return entry
+        return entry.get(date)
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """OpenWeatherMap 5 günlük tahmin API'si; hedef günün öğlen tahminini kullanır"""
+
+    API_URL = 'https://api.openweathermap.org/data/2.5/forecast'
+
+    def __init__(self, api_key, timeout=5):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._cache = {}
+
+    def get_forecast(self, city, date):
+        cache_key = (normalize_city(city), date)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
+
+        try:
+            response = requests.get(
+                self.API_URL,
+                params={'q': city, 'appid': self.api_key, 'units': 'metric'},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            entries = response.json().get('list', [])
+        except (requests.RequestException, ValueError) as e:
+            print(f"❌ Hava tahmini alınamadı ({city}): {e}")
+            return None
+
+        forecast = None
+        for entry in entries:
+            if entry.get('dt_txt', '').startswith(f"{date} 12:"):
+                forecast = {
+                    'temperature': entry['main']['temp'],
+                    'condition': entry['weather'][0]['main'].lower()
+                }
+                break
+
+        self._cache[cache_key] = forecast
+        return forecast
+
+
+def create_weather_provider():
+    """PRECOMPUTE_WEATHER_PROVIDER ortam değişkenine göre sağlayıcı oluştur"""
+    provider = os.environ.get('PRECOMPUTE_WEATHER_PROVIDER', 'file')
+    if provider == 'openweathermap':
+        return OpenWeatherMapProvider(os.environ['OPENWEATHER_API_KEY'])
+    return FileWeatherProvider(
+        os.environ.get('PRECOMPUTE_FORECAST_FILE', os.path.join(DATA_DIR, 'forecasts.json'))
+    )
+
+
+class PrecomputeStore:
+    """Aktif kullanıcılar ve önceden hesaplanan öneriler için SQLite deposu
+
+    Servis ve worker aynı dosyayı paylaşabilir (WAL modu).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS active_users (
+                user_id TEXT PRIMARY KEY,
+                city TEXT,
+                items TEXT NOT NULL,
+                wardrobe_key TEXT NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_active_users_last_seen ON active_users (last_seen)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS recommendations (
+                user_id TEXT PRIMARY KEY,
+                target_date TEXT NOT NULL,
+                weather_band TEXT NOT NULL,
+                wardrobe_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def touch_user(self, user_id, city, user_items, items_key=None):
+        """Kullanıcının son aktivitesini kaydet
+
+        Gardırop ve şehir değişmediyse sadece last_seen güncellenir; gardırop
+        JSON'u yalnızca değiştiğinde yazılır.
+        """
+        items_key = items_key or wardrobe_key(user_items)
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                'UPDATE active_users SET last_seen = ? WHERE user_id = ? AND wardrobe_key = ? AND city IS ?',
+                (now, user_id, items_key, city)
+            ).rowcount
+            if updated:
+                return
+
+        items_json = json.dumps(user_items, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO active_users (user_id, city, items, wardrobe_key, last_seen) VALUES (?, ?, ?, ?, ?)',
+                (user_id, city, items_json, items_key, now)
+            )
+
+    def count_active_users(self, since_seconds):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM active_users WHERE last_seen >= ?', (time.time() - since_seconds,)
+            ).fetchone()
+        return row[0]
+
+    def active_users(self, since_seconds, batch_size=500):
+        """Son since_seconds içinde aktif kullanıcılar, en son aktif olan önce
+
+        (user_id, city, items_json, wardrobe_key) üretir. Gardıroplar belleğe
+        batch_size'lık gruplar halinde (last_seen, user_id) üzerinden keyset
+        sayfalama ile okunur. Tur sırasında tekrar aktif olan kullanıcı imlecin
+        üstüne çıkar ve bu turda atlanır (isteği zaten canlı hesaplanır).
+        """
+        cutoff = time.time() - since_seconds
+        cursor = None
+        while True:
+            with self._lock:
+                if cursor is None:
+                    rows = self._conn.execute(
+                        'SELECT user_id, city, items, wardrobe_key, last_seen FROM active_users '
+                        'WHERE last_seen >= ? ORDER BY last_seen DESC, user_id DESC LIMIT ?',
+                        (cutoff, batch_size)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        'SELECT user_id, city, items, wardrobe_key, last_seen FROM active_users '
+                        'WHERE last_seen >= ? AND (last_seen < ? OR (last_seen = ? AND user_id < ?)) '
+                        'ORDER BY last_seen DESC, user_id DESC LIMIT ?',
+                        (cutoff, cursor[0], cursor[0], cursor[1], batch_size)
+                    ).fetchall()
+            for user_id, city, items_json, items_key, _ in rows:
+                yield user_id, city, items_json, items_key
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1][4], rows[-1][0])
+
+    def put(self, user_id, date, band, items_key, recommendations):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO recommendations (user_id, target_date, weather_band, wardrobe_key, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (user_id, date, band, items_key, json.dumps(recommendations, ensure_ascii=False), time.time())
+            )
+
+    def get(self, user_id, date, band, items_key):
+        """Eşleşen öneriyi döndür (silmez; bkz. discard)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload FROM recommendations WHERE user_id = ? AND target_date = ? AND weather_band = ? AND wardrobe_key = ?',
+                (user_id, date, band, items_key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def discard(self, user_id, date):
+        """Servis edilen öneriyi sil (her önceden hesaplanan sonuç bir kez servis edilir)"""
+        with self._lock:
+            self._conn.execute('DELETE FROM recommendations WHERE user_id = ? AND target_date = ?', (user_id, date))
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def acquire_lease(self, name, owner, ttl_seconds):
+        """Süreler arası kilit: boşsa, süresi dolduysa ya da zaten owner'daysa al/uzat
+
+        Tek bir UPSERT ile atomiktir; kilidi tutan süreç ölürse ttl_seconds
+        sonra başka bir süreç alabilir.
+        """
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.expires_at < ? OR leases.owner = excluded.owner',
+                (name, owner, now + ttl_seconds, now)
+            ).rowcount == 1
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    def prune(self, before_date, active_since_seconds):
+        """Hedef günü geçmiş önerileri ve aktif sayılma süresini aşan kullanıcıları sil"""
+        with self._lock:
+            self._conn.execute('DELETE FROM recommendations WHERE target_date < ?', (before_date,))
+            self._conn.execute('DELETE FROM active_users WHERE last_seen < ?', (time.time() - active_since_seconds,))
+
+
+class PrecomputeScheduler:
+    """Aktif kullanıcıların ertesi sabah önerilerini yoğun olmayan saatlerde hesaplar"""
+
+    # Tur kilidi; tutan süreç her kullanıcıda uzatır, ölürse bu süre sonra serbest kalır
+    LEASE_NAME = 'precompute-run'
+    LEASE_SECONDS = 600
+
+    def __init__(self, recommender, store, weather_provider, run_hour=4, rate_per_second=20.0,
+                 active_window_seconds=7 * 24 * 3600, reload_history=False):
+        self.recommender = recommender
+        self.store = store
+        self.weather_provider = weather_provider
+        self.run_hour = run_hour
+        self.rate_per_second = rate_per_second
+        self.active_window_seconds = active_window_seconds
+        # Ayrı worker'da geçmiş servisin snapshot'ından her tur öncesi yeniden okunur
+        self.reload_history = reload_history
+        self._owner = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'runs': 0,
+            'running': False,
+            'last_run_started': None,
+            'last_run_finished': None,
+            'last_run_seconds': None,
+            'target_date': None,
+            'users_total': 0,
+            'users_done': 0,
+            'computed': 0,
+            'skipped_no_city': 0,
+            'skipped_no_forecast': 0,
+            'failed': 0,
+            'hits': 0,
+            'misses': 0
+        }
+
+    def _update_metrics(self, **values):
+        with self._metrics_lock:
+            self.metrics.update(values)
+
+    def _increment(self, name):
+        with self._metrics_lock:
+            self.metrics[name] += 1
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            return dict(self.metrics)
+
+    def lookup(self, user_id, weather, user_items):
+        """İstek yolunda önceden hesaplanan sonucu ara; yoksa None (canlı hesaplamaya düşülür)
+
+        Sonuç silinmez: yanıt gerçekten gönderildikten sonra consume çağrılır,
+        süresi dolan istek sonucu tüketmez.
+        """
+        items_key = wardrobe_key(user_items)
+        result = self.store.get(user_id, datetime.now().date().isoformat(), weather_band(weather), items_key)
+        self._increment('hits' if result is not None else 'misses')
+        return result, items_key
+
+    def consume(self, user_id):
+        """Servis edilen önceden hesaplanmış sonucu sil"""
+        self.store.discard(user_id, datetime.now().date().isoformat())
+
+    def run_once(self, now=None):
+        """Tüm aktif kullanıcılar için bir hesaplama turu
+
+        Aynı depoyu paylaşan süreçlerden (servis + worker) yalnızca biri
+        çalışır: depodaki tur kilidi alınamazsa ya da bu hedef gün için tur
+        zaten tamamlandıysa tur atlanır.
+        """
+        date = target_date(now)
+        if not self.store.acquire_lease(self.LEASE_NAME, self._owner, self.LEASE_SECONDS):
+            print("⏭️ Ön hesaplama başka bir süreçte çalışıyor, tur atlandı")
+            return False
+        try:
+            if self.store.get_meta('last_completed_date') == date:
+                print(f"⏭️ {date} için ön hesaplama zaten yapılmış, tur atlandı")
+                return False
+            self._run(date)
+            if not self._stop.is_set():
+                self.store.set_meta('last_completed_date', date)
+        finally:
+            self.store.release_lease(self.LEASE_NAME, self._owner)
+        return True
+
+    def _run(self, date):
+        self.store.prune(datetime.now().date().isoformat(), self.active_window_seconds)
+        if self.reload_history and self.recommender.history.snapshot_path:
+            self.recommender.history.load()
+
+        users_total = self.store.count_active_users(self.active_window_seconds)
+        started = time.time()
+        self._increment('runs')
+        self._update_metrics(
+            running=True,
+            last_run_started=datetime.now().isoformat(),
+            target_date=date,
+            users_total=users_total,
+            users_done=0,
+            computed=0,
+            skipped_no_city=0,
+            skipped_no_forecast=0,
+            failed=0
+        )
+        print(f"🌙 Ön hesaplama başladı: {users_total} aktif kullanıcı, hedef gün {date}")
+
+        interval = 1.0 / self.rate_per_second if self.rate_per_second > 0 else 0
+        next_slot = time.monotonic()
+
+        for user_id, city, items_json, items_key in self.store.active_users(self.active_window_seconds):
+            if self._stop.is_set():
+                break
+            if not self.store.acquire_lease(self.LEASE_NAME, self._owner, self.LEASE_SECONDS):
+                print("⚠️ Ön hesaplama kilidi kaybedildi, tur durduruldu")
+                break
+
+            try:
+                if not city:
+                    self._increment('skipped_no_city')
+                    continue
+
+                forecast = self.weather_provider.get_forecast(city, date)
+                if not forecast:
+                    self._increment('skipped_no_forecast')
+                    continue
+                forecast = normalize_weather(forecast, field=f'forecast[{city}]')
+
+                # Hız sınırı: saniyede en fazla rate_per_second hesaplama
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                next_slot = max(next_slot, time.monotonic()) + interval
+
+                # Geçmiş okunur ama yazılmaz: kombinler kullanıcıya henüz gösterilmedi,
+                # servis edildiklerinde geçmişe yazılır
+                recommendations = self.recommender.recommend_multiple(
+                    json.loads(items_json), forecast, user_id, record=False
+                )
+                self.store.put(user_id, date, weather_band(forecast), items_key, recommendations)
+                self._increment('computed')
+            except Exception as e:
+                print(f"❌ Ön hesaplama hatası ({user_id}): {e}")
+                self._increment('failed')
+            finally:
+                self._increment('users_done')
+
+        elapsed = time.time() - started
+        self._update_metrics(
+            running=False,
+            last_run_finished=datetime.now().isoformat(),
+            last_run_seconds=round(elapsed, 2)
+        )
+        print(f"✅ Ön hesaplama bitti: {self.metrics['computed']}/{users_total} kullanıcı, {elapsed:.1f} sn")
+
+    def _seconds_until_next_run(self):
+        now = datetime.now()
+        next_run = now.replace(hour=self.run_hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            if self._stop.wait(self._seconds_until_next_run()):
+                break
+            self.run_once()
+
+    def start(self):
+        """Zamanlayıcıyı arka plan thread'inde başlat"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name='precompute-scheduler', daemon=True)
+            self._thread.start()
+            print(f"⏰ Ön hesaplama zamanlayıcısı başlatıldı (her gün {self.run_hour:02d}:00)")
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_scheduler(recommender, reload_history=False):
+    """Ortam değişkenlerinden depo, sağlayıcı ve zamanlayıcıyı oluştur"""
+    store = PrecomputeStore(os.environ.get('PRECOMPUTE_DB', os.path.join(DATA_DIR, 'precompute.sqlite3')))
+    return PrecomputeScheduler(
+        recommender,
+        store,
+        create_weather_provider(),
+        run_hour=int(os.environ.get('PRECOMPUTE_HOUR', 4)),
+        rate_per_second=float(os.environ.get('PRECOMPUTE_RATE', 20)),
+        active_window_seconds=int(os.environ.get('PRECOMPUTE_ACTIVE_DAYS', 7)) * 24 * 3600,
+        reload_history=reload_history
+    )
+
+
+if __name__ == '__main__':
+    from models.outfit_model import OutfitRecommender
+    from models.recent_history import create_history
+
+    parser = argparse.ArgumentParser(description='Sabah önerilerini önceden hesapla')
+    parser.add_argument('--once', action='store_true', help='Tek tur çalıştır ve çık')
+    args = parser.parse_args()
+
+    # Servisin geçmiş snapshot'ı (RECENT_HISTORY_PATH) salt okunur kullanılır; worker geçmişi yazmaz
+    history = create_history(snapshot_path=os.environ.get('RECENT_HISTORY_PATH'))
+    scheduler = create_scheduler(OutfitRecommender(history=history), reload_history=True)
+    if args.once:
+        scheduler.run_once()
+    else:
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
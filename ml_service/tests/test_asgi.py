@@ -0,0 +1,218 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import app as service
+import asgi
+from asgi import BoundedExecutor, DeadlineExceeded, RecommendASGIApp
+
+ITEM = {'id': 'top1', 'name': 'Beyaz T-Shirt', 'type': 'tShirt', 'colors': ['#ffffff'], 'seasons': ['summer']}
+BODY = json.dumps({'userId': 'u1', 'weather': {'temperature': 22, 'condition': 'sunny'}, 'userClothingItems': [ITEM]})
+
+
+def make_app(handler, max_workers=1, max_queue=1):
+    """Öneri endpoint'i verilen handler'ı çağıran ASGI uygulaması"""
+    application = RecommendASGIApp(service.app, max_workers=max_workers, max_queue=max_queue)
+    application.ROUTES = {'/api/recommend': handler}
+    return application
+
+
+async def call(application, path, method='POST', body=BODY.encode(), query=b'', headers=(), disconnect=False,
+               events=None):
+    """ASGI isteği gönder; (status, başlıklar, gövde) ya da yanıt yoksa None"""
+    scope = {'type': 'http', 'path': path, 'method': method, 'query_string': query, 'headers': list(headers)}
+    messages = []
+
+    async def receive():
+        if disconnect:
+            return {'type': 'http.disconnect'}
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+        if events is not None:
+            events.append(message['type'])
+
+    await application(scope, receive, send)
+    if not messages:
+        return None
+    start, response_body = messages
+    return start['status'], dict(start['headers']), response_body['body']
+
+
+class BlockingHandler:
+    """gate açılana kadar worker thread'ini meşgul eden handler"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.committed = []
+
+    def __call__(self, user_id, weather, items):
+        self.gate.wait(5)
+        return ['tamam'], lambda: self.committed.append(user_id)
+
+
+def test_response_is_sent_before_side_effects():
+    events = []
+
+    def handler(user_id, weather, items):
+        return ['tamam'], lambda: events.append('commit')
+
+    status, _, body = asyncio.run(call(make_app(handler), '/api/recommend', events=events))
+
+    assert status == 200
+    assert json.loads(body) == ['tamam']
+    assert events == ['http.response.start', 'http.response.body', 'commit']
+
+
+def test_full_queue_returns_429_with_retry_after():
+    handler = BlockingHandler()
+    application = make_app(handler, max_workers=1, max_queue=1)
+
+    async def scenario():
+        running = asyncio.create_task(call(application, '/api/recommend'))
+        waiting = asyncio.create_task(call(application, '/api/recommend'))
+        await asyncio.sleep(0.05)
+        rejected = await call(application, '/api/recommend')
+        handler.gate.set()
+        return rejected, await running, await waiting
+
+    rejected, running, waiting = asyncio.run(scenario())
+
+    assert rejected[0] == 429
+    assert int(rejected[1][b'retry-after']) >= 1
+    assert running[0] == waiting[0] == 200
+    assert application.executor.rejected == 1
+
+
+def test_deadline_returns_503_without_side_effects():
+    handler = BlockingHandler()
+    application = make_app(handler)
+
+    async def scenario():
+        response = await call(application, '/api/recommend', headers=[(b'x-request-deadline-ms', b'50')])
+        handler.gate.set()
+        # Thread işini bitirse de commit çağrılmaz
+        await asyncio.sleep(0.1)
+        return response
+
+    status, headers, _ = asyncio.run(scenario())
+
+    assert status == 503
+    assert int(headers[b'retry-after']) >= 1
+    assert handler.committed == []
+    assert application.executor.timed_out == 1
+
+
+def test_expired_job_is_never_submitted():
+    submitted = []
+
+    async def scenario():
+        executor = BoundedExecutor(1, 1)
+        loop = asyncio.get_running_loop()
+        executor._slots = asyncio.Semaphore(1)
+        acquire = executor._slots.acquire
+
+        async def slow_acquire():
+            # Slot alındı ama bu sırada süre doldu
+            await acquire()
+            time.sleep(0.05)
+            return True
+
+        executor._slots.acquire = slow_acquire
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(loop.time() + 0.02, submitted.append, 'iş')
+        return executor
+
+    executor = asyncio.run(scenario())
+
+    assert submitted == []
+    assert executor.running == 0
+    assert not executor._slots.locked()
+
+
+def test_oversized_body_returns_413(monkeypatch):
+    monkeypatch.setattr(asgi, 'MAX_BODY_BYTES', 10)
+
+    status, _, _ = asyncio.run(call(make_app(BlockingHandler()), '/api/recommend'))
+
+    assert status == 413
+
+
+def test_disconnect_sends_no_response():
+    assert asyncio.run(call(make_app(BlockingHandler()), '/api/recommend', disconnect=True)) is None
+
+
+def test_invalid_request_returns_400_without_using_the_pool():
+    application = make_app(BlockingHandler())
+
+    status, _, body = asyncio.run(call(application, '/api/recommend', body=b'{"weather": 1}'))
+
+    assert status == 400
+    assert json.loads(body)['details'] == [{'field': 'weather', 'message': 'nesne olmalı'}]
+    assert application.executor.completed == 0
+
+
+def test_health_responds_while_pool_is_saturated():
+    handler = BlockingHandler()
+    application = make_app(handler, max_workers=1, max_queue=1)
+
+    async def scenario():
+        busy = [asyncio.create_task(call(application, '/api/recommend')) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        health = await call(application, '/health', method='GET')
+        elapsed = time.monotonic() - started
+        handler.gate.set()
+        await asyncio.gather(*busy)
+        return health, elapsed
+
+    (status, _, body), elapsed = asyncio.run(scenario())
+
+    assert status == 200
+    assert json.loads(body)['details']['saturated'] is True
+    assert elapsed < 1
+
+
+def test_catalog_body_and_etag_match_flask():
+    application = RecommendASGIApp(service.app)
+    query = b'band=cold&condition=rain&seed=3'
+
+    status, headers, body = asyncio.run(call(application, '/api/catalog-recommendations', 'GET', query=query))
+    flask_response = service.app.test_client().get(f'/api/catalog-recommendations?{query.decode()}')
+
+    assert status == 200
+    assert body == flask_response.data
+    assert headers[b'etag'].decode() == flask_response.headers['ETag']
+
+    status, _, body = asyncio.run(call(application, '/api/catalog-recommendations', 'GET', query=query,
+                                       headers=[(b'if-none-match', headers[b'etag'])]))
+    assert status == 304
+    assert body == b''
+
+
+def test_catalog_goes_through_the_pool():
+    application = RecommendASGIApp(service.app)
+
+    status, _, _ = asyncio.run(call(application, '/api/catalog-recommendations', 'GET', query=b'band=hot'))
+    assert status == 400
+    assert application.executor.completed == 0
+
+    status, _, _ = asyncio.run(call(application, '/api/catalog-recommendations', 'GET', query=b'band=warm'))
+    assert status == 200
+    assert application.executor.completed == 1
+
+
+def test_flask_path_records_history_after_response():
+    client = service.app.test_client()
+    data = json.loads(BODY)
+    data['userId'] = 'flask-kullanici'
+
+    response = client.post('/api/recommend-multiple', json=data)
+    response.close()
+
+    assert response.status_code == 200
+    assert service.history.recent_keys('flask-kullanici')
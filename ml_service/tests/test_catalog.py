@@ -0,0 +1,63 @@
+import pytest
+
+from app import app
+
+URL = '/api/catalog-recommendations'
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_same_parameters_return_same_body(client):
+    first = client.get(f'{URL}?band=cold&condition=rain&seed=3')
+    second = client.get(f'{URL}?seed=3&condition=rain&band=cold')
+
+    assert first.status_code == 200
+    assert first.get_json()
+    assert first.data == second.data
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert 'public' in first.headers['Cache-Control']
+
+
+def test_seed_changes_the_body(client):
+    bodies = {client.get(f'{URL}?band=mild&seed={seed}').data for seed in range(5)}
+
+    assert len(bodies) > 1
+
+
+def test_strategy_filter(client):
+    response = client.get(f'{URL}?band=warm&strategy=color_harmony')
+
+    assert [rec['strategy'] for rec in response.get_json()] == ['color_harmony']
+
+
+def test_etag_round_trip(client):
+    response = client.get(f'{URL}?band=warm&seed=1')
+    etag = response.headers['ETag']
+
+    not_modified = client.get(f'{URL}?band=warm&seed=1', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+
+    modified = client.get(f'{URL}?band=warm&seed=1', headers={'If-None-Match': '"baska"'})
+    assert modified.status_code == 200
+
+
+@pytest.mark.parametrize('query', [
+    'band=hot',
+    'condition=fog',
+    'strategy=unknown',
+    'seed=-1',
+    'seed=abc',
+    'seed=100',
+    'seed=007',
+    'seed=%D9%A3',  # Arapça rakam
+    'seed=',
+])
+def test_invalid_parameters(client, query):
+    response = client.get(f'{URL}?{query}')
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,286 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import precompute
+from models.recent_history import RecentOutfitHistory
+from precompute import FileWeatherProvider, PrecomputeScheduler, PrecomputeStore, normalize_city, weather_band
+
+FORECAST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'forecasts.json')
+
+ITEMS = [
+    {'id': 'top1', 'name': 'Beyaz T-Shirt', 'type': 'tShirt', 'colors': ['#ffffff'], 'seasons': ['summer']},
+    {'id': 'bottom1', 'name': 'Mavi Jean', 'type': 'jeans', 'colors': ['#0000ff'], 'seasons': ['all']}
+]
+
+
+class FakeRecommender:
+    """recommend_multiple çağrılarını kaydeden sahte öneri motoru"""
+
+    def __init__(self, history=None):
+        self.calls = []
+        self.history = history if history is not None else RecentOutfitHistory(max_users=16)
+
+    def recommend_multiple(self, user_items, weather, user_id=None, strategy_names=None, record=True):
+        self.calls.append({'items': user_items, 'weather': weather, 'user_id': user_id, 'record': record})
+        return [{'title': 'test', 'description': 'test', 'strategy': 'weather_focused', 'items': user_items}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PrecomputeStore(str(tmp_path / 'precompute.sqlite3'))
+
+
+@pytest.fixture
+def night():
+    # Gece 02:00'de çalışan tur bugünün sabahı için hesaplar
+    return datetime.now().replace(hour=2, minute=0, second=0, microsecond=0)
+
+
+def make_scheduler(store, recommender=None, rate_per_second=0, reload_history=False):
+    return PrecomputeScheduler(
+        recommender or FakeRecommender(),
+        store,
+        FileWeatherProvider(FORECAST_FILE),
+        rate_per_second=rate_per_second,
+        reload_history=reload_history
+    )
+
+
+def touch_users(store, monkeypatch, users):
+    """Kullanıcıları verilen sırayla, artan last_seen ile kaydet"""
+    base = time.time() - len(users)
+    for offset, (user_id, city) in enumerate(users):
+        monkeypatch.setattr(precompute.time, 'time', lambda offset=offset: base + offset)
+        store.touch_user(user_id, city, ITEMS)
+    monkeypatch.undo()
+
+
+@pytest.mark.parametrize('weather, expected', [
+    ({'temperature': -3, 'condition': 'snow'}, 'cold:snow'),
+    ({'temperature': 9.9, 'condition': 'clear'}, 'cold:clear'),
+    ({'temperature': 10, 'condition': 'light rain'}, 'cool:rain'),
+    ({'temperature': 14, 'condition': 'thunderstorm'}, 'cool:rain'),
+    ({'temperature': 15, 'condition': 'clouds'}, 'mild:clear'),
+    ({'temperature': 20, 'condition': 'clear'}, 'warm:clear'),
+])
+def test_weather_band(weather, expected):
+    assert weather_band(weather) == expected
+
+
+@pytest.mark.parametrize('city, expected', [
+    ('İstanbul', 'istanbul'),
+    ('ISTANBUL', 'istanbul'),
+    (' istanbul ', 'istanbul'),
+    ('İzmir', 'izmir'),
+    ('Muğla', 'mugla'),
+    ('Diyarbakır', 'diyarbakir'),
+    ('Çanakkale', 'canakkale'),
+])
+def test_normalize_city(city, expected):
+    assert normalize_city(city) == expected
+
+
+def test_file_provider_flat_format():
+    provider = FileWeatherProvider(FORECAST_FILE)
+
+    assert provider.get_forecast('Istanbul', '2024-11-02') == {'temperature': 14, 'condition': 'rain'}
+    assert provider.get_forecast('ERZURUM', '2024-11-02') == {'temperature': -3, 'condition': 'snow'}
+    assert provider.get_forecast('bilinmeyen', '2024-11-02') is None
+
+
+def test_file_provider_matches_turkish_city_names():
+    # Flutter istemcisi lang=tr ile 'İstanbul', 'İzmir' gönderir
+    provider = FileWeatherProvider(FORECAST_FILE)
+
+    assert provider.get_forecast('İstanbul', '2024-11-02') == {'temperature': 14, 'condition': 'rain'}
+    assert provider.get_forecast('İZMİR', '2024-11-02') == {'temperature': 21, 'condition': 'clear'}
+
+
+def test_file_provider_per_date_format(tmp_path):
+    path = tmp_path / 'forecasts.json'
+    path.write_text(json.dumps({
+        'Ankara': {
+            '2024-11-02': {'temperature': 3, 'condition': 'snow'},
+            '2024-11-03': {'temperature': 8, 'condition': 'rain'}
+        }
+    }), encoding='utf-8')
+    provider = FileWeatherProvider(str(path))
+
+    assert provider.get_forecast('ankara', '2024-11-02') == {'temperature': 3, 'condition': 'snow'}
+    assert provider.get_forecast('ANKARA', '2024-11-03') == {'temperature': 8, 'condition': 'rain'}
+    assert provider.get_forecast('ankara', '2024-11-04') is None
+
+
+def test_file_provider_missing_file(tmp_path):
+    provider = FileWeatherProvider(str(tmp_path / 'yok.json'))
+
+    assert provider.get_forecast('istanbul', '2024-11-02') is None
+
+
+def test_run_once_processes_recent_users_first_and_counts_skips(store, monkeypatch, night):
+    touch_users(store, monkeypatch, [
+        ('eski', 'Ankara'),
+        ('sehirsiz', None),
+        ('bilinmeyen_sehir', 'Atlantis'),
+        ('yeni', 'Istanbul'),
+    ])
+    recommender = FakeRecommender()
+    scheduler = make_scheduler(store, recommender)
+
+    assert scheduler.run_once(now=night) is True
+
+    assert [call['weather']['condition'] for call in recommender.calls] == ['rain', 'clouds']
+    assert [call['weather']['temperature'] for call in recommender.calls] == [14, 6]
+    # Geçmiş okunur ama yazılmaz
+    assert [call['user_id'] for call in recommender.calls] == ['yeni', 'eski']
+    assert all(call['record'] is False for call in recommender.calls)
+
+    metrics = scheduler.get_metrics()
+    assert metrics['users_total'] == 4
+    assert metrics['users_done'] == 4
+    assert metrics['computed'] == 2
+    assert metrics['skipped_no_city'] == 1
+    assert metrics['skipped_no_forecast'] == 1
+    assert metrics['failed'] == 0
+
+
+def test_run_once_respects_rate_limit(store, monkeypatch, night):
+    touch_users(store, monkeypatch, [('a', 'Istanbul'), ('b', 'Istanbul'), ('c', 'Istanbul')])
+    scheduler = make_scheduler(store, rate_per_second=20)
+
+    started = time.monotonic()
+    scheduler.run_once(now=night)
+
+    # 3 hesaplama, aralarında en az 1/20 sn
+    assert time.monotonic() - started >= 2 * 0.05 * 0.9
+    assert scheduler.get_metrics()['computed'] == 3
+
+
+def test_run_once_skips_when_target_date_already_done(store, monkeypatch, night):
+    touch_users(store, monkeypatch, [('a', 'Istanbul')])
+    recommender = FakeRecommender()
+    scheduler = make_scheduler(store, recommender)
+
+    assert scheduler.run_once(now=night) is True
+    assert scheduler.run_once(now=night) is False
+    assert len(recommender.calls) == 1
+
+
+def test_run_once_skips_when_another_process_holds_the_lease(store, monkeypatch, night):
+    touch_users(store, monkeypatch, [('a', 'Istanbul')])
+    recommender = FakeRecommender()
+    scheduler = make_scheduler(store, recommender)
+    assert store.acquire_lease(PrecomputeScheduler.LEASE_NAME, 'baska-surec', 60)
+
+    assert scheduler.run_once(now=night) is False
+    assert recommender.calls == []
+
+    store.release_lease(PrecomputeScheduler.LEASE_NAME, 'baska-surec')
+    assert scheduler.run_once(now=night) is True
+    assert len(recommender.calls) == 1
+
+
+def test_expired_lease_can_be_taken_over(store):
+    assert store.acquire_lease('kilit', 'a', -1)
+    assert store.acquire_lease('kilit', 'b', 60)
+    assert not store.acquire_lease('kilit', 'a', 60)
+    assert store.acquire_lease('kilit', 'b', 60)
+
+
+def test_active_users_are_read_in_batches(store, monkeypatch):
+    users = [(f'user{i:02d}', 'Istanbul') for i in range(7)]
+    touch_users(store, monkeypatch, users)
+
+    rows = list(store.active_users(3600, batch_size=3))
+
+    assert [row[0] for row in rows] == [user_id for user_id, _ in reversed(users)]
+
+
+def test_active_users_with_equal_last_seen_are_not_skipped(store, monkeypatch):
+    monkeypatch.setattr(precompute.time, 'time', lambda: 1_000_000)
+    for i in range(5):
+        store.touch_user(f'user{i}', 'Istanbul', ITEMS)
+    monkeypatch.setattr(precompute.time, 'time', lambda: 1_000_100)
+
+    rows = list(store.active_users(3600, batch_size=2))
+
+    assert sorted(row[0] for row in rows) == [f'user{i}' for i in range(5)]
+
+
+def test_prune_removes_inactive_users(store, monkeypatch):
+    monkeypatch.setattr(precompute.time, 'time', lambda: 1_000_000)
+    store.touch_user('eski', 'Istanbul', ITEMS)
+    monkeypatch.setattr(precompute.time, 'time', lambda: 1_000_000 + 7200)
+    store.touch_user('yeni', 'Istanbul', ITEMS)
+
+    store.prune('2024-11-02', 3600)
+
+    assert store.count_active_users(10**9) == 1
+    assert [row[0] for row in store.active_users(10**9)] == ['yeni']
+
+
+def test_worker_reloads_history_snapshot(store, monkeypatch, night, tmp_path):
+    touch_users(store, monkeypatch, [('a', 'Istanbul')])
+    path = str(tmp_path / 'history.pickle')
+    service_history = RecentOutfitHistory(max_users=16, snapshot_path=path)
+    worker_history = RecentOutfitHistory(max_users=16, snapshot_path=path)
+    service_history.record('a', [ITEMS], ITEMS)
+    service_history.save()
+
+    scheduler = make_scheduler(store, FakeRecommender(worker_history), reload_history=True)
+    scheduler.run_once(now=night)
+
+    assert worker_history.recent_keys('a') == service_history.recent_keys('a')
+
+
+def test_lookup_hit_is_served_once(store, monkeypatch, night):
+    touch_users(store, monkeypatch, [('a', 'Istanbul')])
+    scheduler = make_scheduler(store)
+    scheduler.run_once(now=night)
+
+    weather = {'temperature': 13, 'condition': 'rain'}
+    expected = [{'title': 'test', 'description': 'test', 'strategy': 'weather_focused', 'items': ITEMS}]
+    result, _ = scheduler.lookup('a', weather, ITEMS)
+    assert result == expected
+
+    # Yanıt gönderilmediyse (ör. süre doldu) sonuç tüketilmez
+    result, _ = scheduler.lookup('a', weather, ITEMS)
+    assert result == expected
+
+    # Tek seferlik: servis edildikten sonra istek canlı hesaplamaya düşer
+    scheduler.consume('a')
+    result, _ = scheduler.lookup('a', weather, ITEMS)
+    assert result is None
+
+    metrics = scheduler.get_metrics()
+    assert metrics['hits'] == 2
+    assert metrics['misses'] == 1
+
+
+@pytest.mark.parametrize('user_id, weather, items', [
+    ('a', {'temperature': 25, 'condition': 'clear'}, ITEMS),        # farklı hava bandı
+    ('a', {'temperature': 13, 'condition': 'rain'}, ITEMS[:1]),     # gardırop değişti
+    ('b', {'temperature': 13, 'condition': 'rain'}, ITEMS),         # başka kullanıcı
+])
+def test_lookup_miss(store, monkeypatch, night, user_id, weather, items):
+    touch_users(store, monkeypatch, [('a', 'Istanbul')])
+    scheduler = make_scheduler(store)
+    scheduler.run_once(now=night)
+
+    result, _ = scheduler.lookup(user_id, weather, items)
+
+    assert result is None
+    assert scheduler.get_metrics()['misses'] == 1
+
+
+def test_touch_user_keeps_wardrobe_when_unchanged(store):
+    store.touch_user('a', 'Istanbul', ITEMS)
+    store.touch_user('a', 'Istanbul', ITEMS)
+    store.touch_user('a', 'Ankara', ITEMS[:1])
+
+    (user_id, city, items_json, _), = store.active_users(3600)
+    assert (user_id, city, json.loads(items_json)) == ('a', 'Ankara', ITEMS[:1])
@@ -0,0 +1,152 @@
+import json
+import os
+
+import pytest
+
+from models import recent_history
+from models.outfit_model import OutfitRecommender
+from models.recent_history import RecentOutfitHistory
+from validation import normalize_items
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'clothing_items.json')
+
+T0 = 1_700_000_000
+MINUTE = 60
+
+OUTFIT = [
+    {'id': 'top1', 'name': 'Beyaz T-Shirt', 'type': 'tShirt'},
+    {'id': 'bottom1', 'name': 'Mavi Jean', 'type': 'jeans'}
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """recent_history içindeki time.time'ı elle ilerletilen saate bağla"""
+    now = [T0]
+    monkeypatch.setattr(recent_history.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def catalog_items():
+    with open(DATA_FILE, 'r', encoding='utf-8') as f:
+        all_items = json.load(f)
+    return normalize_items([item for item in all_items if item['userId'] == all_items[0]['userId']])
+
+
+def test_recorded_keys_expire_after_ttl(clock):
+    history = RecentOutfitHistory(ttl_seconds=3600, max_users=16)
+    history.record('u1', [OUTFIT], OUTFIT)
+    expected = {history.outfit_key(OUTFIT)} | {history.item_key(item) for item in OUTFIT}
+
+    clock[0] = T0 + 30 * MINUTE
+    assert history.recent_keys('u1') == expected
+
+    clock[0] = T0 + 61 * MINUTE
+    assert history.recent_keys('u1') == frozenset()
+
+
+def test_expired_keys_do_not_come_back(clock):
+    # 16 bit dakika sayacı 65536 dakikada başa dönerdi
+    history = RecentOutfitHistory(ttl_seconds=3600, max_users=16)
+    history.record('u1', [OUTFIT], OUTFIT)
+
+    clock[0] = T0 + 65536 * MINUTE
+    assert history.recent_keys('u1') == frozenset()
+
+
+def test_unknown_or_anonymous_user_has_no_history(clock):
+    history = RecentOutfitHistory(max_users=16)
+    history.record(None, [OUTFIT], OUTFIT)
+
+    assert history.recent_keys(None) == frozenset()
+    assert history.recent_keys('yok') == frozenset()
+    assert len(history) == 0
+
+
+def test_full_table_evicts_least_recently_touched_user(clock):
+    history = RecentOutfitHistory(max_users=3, probe_window=3)
+    for offset, user_id in enumerate(['a', 'b', 'c']):
+        clock[0] = T0 + offset * MINUTE
+        history.record(user_id, [OUTFIT], OUTFIT)
+
+    # 'a' tekrar görülünce en eski 'b' olur
+    clock[0] = T0 + 10 * MINUTE
+    history.record('a', [OUTFIT], OUTFIT)
+    history.record('d', [OUTFIT], OUTFIT)
+
+    assert len(history) == 3
+    assert history.recent_keys('b') == frozenset()
+    assert history.recent_keys('a') and history.recent_keys('c') and history.recent_keys('d')
+
+
+def test_long_idle_user_is_evicted_first(clock):
+    history = RecentOutfitHistory(max_users=2, probe_window=2)
+    history.record('idle', [OUTFIT], OUTFIT)
+    clock[0] = T0 + (65536 - 10) * MINUTE
+    history.record('active', [OUTFIT], OUTFIT)
+
+    clock[0] = T0 + 65536 * MINUTE
+    history.record('new', [OUTFIT], OUTFIT)
+
+    assert history.recent_keys('active')
+    assert history.recent_keys('idle') == frozenset()
+
+
+def test_snapshot_round_trip(clock, tmp_path):
+    path = str(tmp_path / 'history.pickle')
+    history = RecentOutfitHistory(max_users=16, snapshot_path=path)
+    history.record('u1', [OUTFIT], OUTFIT)
+    history.save()
+
+    restored = RecentOutfitHistory(max_users=16, snapshot_path=path)
+
+    assert len(restored) == 1
+    assert restored.recent_keys('u1') == history.recent_keys('u1')
+    assert [name for name in os.listdir(tmp_path)] == ['history.pickle']
+
+
+def test_snapshot_with_different_size_is_ignored(clock, tmp_path):
+    path = str(tmp_path / 'history.pickle')
+    history = RecentOutfitHistory(max_users=16)
+    history.record('u1', [OUTFIT], OUTFIT)
+    history.save(path)
+
+    restored = RecentOutfitHistory(max_users=32, snapshot_path=path)
+
+    assert len(restored) == 0
+
+
+def test_recommend_multiple_records_once_per_response(catalog_items, monkeypatch):
+    recommender = OutfitRecommender(history=RecentOutfitHistory(max_users=16))
+    calls = []
+    record = recommender.history.record
+    monkeypatch.setattr(recommender.history, 'record', lambda *args: calls.append(args) or record(*args))
+
+    recommendations = recommender.recommend_multiple(catalog_items, {'temperature': 5, 'condition': 'rain'}, 'u1')
+
+    assert len(calls) == 1
+    user_id, outfits, _ = calls[0]
+    assert user_id == 'u1'
+    assert outfits == [rec['items'] for rec in recommendations]
+
+
+def test_recommend_multiple_without_recording(catalog_items):
+    recommender = OutfitRecommender(history=RecentOutfitHistory(max_users=16))
+
+    recommender.recommend_multiple(catalog_items, {'temperature': 5, 'condition': 'rain'}, 'u1', record=False)
+
+    assert recommender.history.recent_keys('u1') == frozenset()
+
+
+def test_recent_items_are_penalized_not_removed():
+    recommender = OutfitRecommender(history=RecentOutfitHistory(max_users=16))
+    coat = {'id': 'coat', 'name': 'Mont', 'type': 'coat', 'colors': [], 'seasons': ['winter']}  # skor 5
+    jacket = {'id': 'jacket', 'name': 'Ceket', 'type': 'jacket', 'colors': [], 'seasons': ['winter', 'all']}  # skor 4
+    shirt = {'id': 'shirt', 'name': 'Gömlek', 'type': 'shirt', 'colors': [], 'seasons': ['summer']}  # skor 0
+    cold = {'temperature': 0, 'condition': 'snow'}
+
+    # Mont çok daha uygun: yakın zamanda gösterilmiş olsa da seçilir
+    assert recommender._select_weather_appropriate([coat, shirt], cold, frozenset({id(coat)})) is coat
+    # Fark cezadan küçükse taze parça öne geçer
+    assert recommender._select_weather_appropriate([coat, jacket], cold, frozenset({id(coat)})) is jacket
@@ -0,0 +1,101 @@
+import pytest
+
+from app import app
+from validation import CLOTHING_TYPES, CONDITIONS, MAX_ERRORS, SEASONS, RequestValidationError, validate_recommend_request
+
+ITEM = {'id': 'top1', 'name': 'Beyaz T-Shirt', 'type': 'tShirt', 'colors': ['#FFFFFF'], 'seasons': ['Summer', 'all']}
+
+
+def request_data(**overrides):
+    data = {'userId': 'u1', 'weather': {'temperature': 22.5, 'condition': 'Sunny'}, 'userClothingItems': [ITEM]}
+    data.update(overrides)
+    return data
+
+
+def errors_of(data):
+    with pytest.raises(RequestValidationError) as excinfo:
+        validate_recommend_request(data)
+    return excinfo.value.errors
+
+
+def test_valid_request_is_normalized():
+    user_id, weather, items = validate_recommend_request(request_data())
+
+    assert user_id == 'u1'
+    assert weather == {'temperature': 22.5, 'condition': 'sunny'}
+    assert weather['condition'] is CONDITIONS['sunny']
+    item, = items
+    assert item['type'] is CLOTHING_TYPES['tShirt']
+    assert item['seasons'] == ['summer', 'all']
+    assert all(season is SEASONS[season] for season in item['seasons'])
+    assert item['colors'] == ['#ffffff']
+    # İstemcinin nesnesi değiştirilmez
+    assert ITEM['colors'] == ['#FFFFFF']
+
+
+def test_unknown_condition_is_kept_lowercase():
+    _, weather, _ = validate_recommend_request(request_data(weather={'temperature': 10, 'condition': 'Light Rain'}))
+
+    assert weather['condition'] == 'light rain'
+
+
+def test_missing_items_default_to_empty_list():
+    data = request_data()
+    del data['userClothingItems']
+
+    assert validate_recommend_request(data)[2] == []
+
+
+@pytest.mark.parametrize('data, field', [
+    (request_data(userId=5), 'userId'),
+    (request_data(weather=None), 'weather'),
+    (request_data(weather={'temperature': 'sıcak', 'condition': 'sunny'}), 'weather.temperature'),
+    (request_data(weather={'temperature': True, 'condition': 'sunny'}), 'weather.temperature'),
+    (request_data(weather={'temperature': float('nan'), 'condition': 'sunny'}), 'weather.temperature'),
+    (request_data(weather={'temperature': 20, 'condition': 'x' * 100}), 'weather.condition'),
+    (request_data(userClothingItems={}), 'userClothingItems'),
+    (request_data(userClothingItems=['tshirt']), 'userClothingItems[0]'),
+    (request_data(userClothingItems=[dict(ITEM, type='cape')]), 'userClothingItems[0].type'),
+    (request_data(userClothingItems=[dict(ITEM, seasons=['autumn'])]), 'userClothingItems[0].seasons'),
+    (request_data(userClothingItems=[dict(ITEM, colors=['red'])]), 'userClothingItems[0].colors'),
+    (request_data(userClothingItems=[dict(ITEM, colors=['#fff'])]), 'userClothingItems[0].colors'),
+    (request_data(userClothingItems=[dict(ITEM, id=3)]), 'userClothingItems[0].id'),
+])
+def test_invalid_fields_are_reported(data, field):
+    assert [error['field'] for error in errors_of(data)] == [field]
+
+
+@pytest.mark.parametrize('data', [None, [], 'metin', 42])
+def test_non_object_body(data):
+    assert errors_of(data) == [{'field': '', 'message': 'JSON nesnesi bekleniyor'}]
+
+
+def test_error_count_is_capped():
+    items = [dict(ITEM, type='cape') for _ in range(MAX_ERRORS * 3)]
+
+    assert len(errors_of(request_data(userClothingItems=items))) == MAX_ERRORS
+
+
+def test_api_returns_structured_400():
+    client = app.test_client()
+
+    response = client.post('/api/recommend-multiple', json=request_data(weather={'temperature': 'x', 'condition': 1}))
+
+    assert response.status_code == 400
+    assert response.get_json() == {
+        'error': 'Geçersiz istek',
+        'details': [
+            {'field': 'weather.temperature', 'message': 'sayı olmalı'},
+            {'field': 'weather.condition', 'message': 'metin olmalı'}
+        ]
+    }
+
+
+@pytest.mark.parametrize('body', [b'{bozuk json', b'[1, 2]', b''])
+def test_api_rejects_non_json_body(body):
+    client = app.test_client()
+
+    response = client.post('/api/recommend', data=body, content_type='application/json')
+
+    assert response.status_code == 400
+    assert response.get_json()['details'] == [{'field': '', 'message': 'JSON nesnesi bekleniyor'}]
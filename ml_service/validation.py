@@ -0,0 +1,179 @@
+"""İstek doğrulama ve normalizasyonu.
+
+Öneri endpoint'lerine gelen gardırop ve hava durumu verisi API sınırında tek
+geçişte kontrol edilir. Yalnızca doğrulanmış enum değerleri (tip, mevsim, bilinen
+hava durumu koşulları) intern edilir; renkler #rrggbb biçiminde doğrulanır ve
+koşul ile birlikte bir kez küçük harfe çevrilir. Stratejiler yalnızca bu
+şekilde normalize edilmiş veriyi görür; hatalı istekler hesaplamaya girmeden
+yapılandırılmış bir hata listesiyle reddedilir.
+"""
+import math
+import re
+import sys
+
+# Flutter tarafındaki ClothingType ve Season enum'ları ile aynı
+CLOTHING_TYPES = {
+    name: sys.intern(name) for name in [
+        'tShirt', 'shirt', 'blouse', 'sweater', 'jacket', 'coat', 'jeans', 'pants',
+        'shorts', 'skirt', 'dress', 'shoes', 'boots', 'accessory', 'hat', 'scarf', 'other'
+    ]
+}
+SEASONS = {name: sys.intern(name) for name in ['spring', 'summer', 'fall', 'winter', 'all']}
+
+# Bilinen hava durumu koşulları: Flutter WeatherCondition enum'u (küçük harf) ve
+# ön hesaplamada kullanılan OpenWeatherMap ana grupları
+CONDITIONS = {
+    name: sys.intern(name) for name in [
+        'sunny', 'cloudy', 'partlycloudy', 'rainy', 'stormy', 'snowy', 'windy', 'foggy', 'hot', 'cold', 'mild', 'any',
+        'clear', 'clouds', 'rain', 'drizzle', 'thunderstorm', 'snow', 'mist', 'fog', 'haze', 'smoke', 'dust',
+        'sand', 'ash', 'squall', 'tornado'
+    ]
+}
+# Bilinmeyen koşullar kabul edilir ama intern edilmez
+MAX_CONDITION_LENGTH = 32
+
+COLOR_PATTERN = re.compile(r'#[0-9a-f]{6}')
+
+# Tek istekte raporlanacak en fazla hata (hatalı büyük istekler de hızlı reddedilsin)
+MAX_ERRORS = 20
+
+
+class RequestValidationError(ValueError):
+    """Doğrulama hataları: [{'field': ..., 'message': ...}, ...]"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} doğrulama hatası")
+        self.errors = errors
+
+
+def _add_error(errors, field, message):
+    errors.append({'field': field, 'message': message})
+    if len(errors) >= MAX_ERRORS:
+        raise RequestValidationError(errors)
+
+
+def _normalize_weather(weather, field, errors):
+    if not isinstance(weather, dict):
+        _add_error(errors, field, 'nesne olmalı')
+        return None
+
+    temperature = weather.get('temperature')
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or not math.isfinite(temperature):
+        _add_error(errors, f'{field}.temperature', 'sayı olmalı')
+
+    condition = weather.get('condition')
+    if not isinstance(condition, str):
+        _add_error(errors, f'{field}.condition', 'metin olmalı')
+    else:
+        condition = condition.lower()
+        if condition in CONDITIONS:
+            condition = CONDITIONS[condition]
+        elif len(condition) > MAX_CONDITION_LENGTH:
+            _add_error(errors, f'{field}.condition', f'en fazla {MAX_CONDITION_LENGTH} karakter olmalı')
+
+    normalized = {
+        'temperature': temperature,
+        'condition': condition
+    }
+    for key in ('description', 'location'):
+        value = weather.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            _add_error(errors, f'{field}.{key}', 'metin olmalı')
+        normalized[key] = value
+    return normalized
+
+
+def _normalize_items(items, field, errors):
+    if not isinstance(items, list):
+        _add_error(errors, field, 'liste olmalı')
+        return []
+
+    normalized_items = []
+    for index, item in enumerate(items):
+        item_field = f'{field}[{index}]'
+        if not isinstance(item, dict):
+            _add_error(errors, item_field, 'nesne olmalı')
+            continue
+
+        normalized = dict(item)
+
+        item_type = CLOTHING_TYPES.get(item.get('type'))
+        if item_type is None:
+            _add_error(errors, f'{item_field}.type', f"geçersiz kıyafet tipi: {item.get('type')!r}")
+        normalized['type'] = item_type
+
+        name = item.get('name', '')
+        if not isinstance(name, str):
+            _add_error(errors, f'{item_field}.name', 'metin olmalı')
+        normalized['name'] = name
+
+        item_id = item.get('id')
+        if item_id is not None and not isinstance(item_id, str):
+            _add_error(errors, f'{item_field}.id', 'metin olmalı')
+
+        seasons = item.get('seasons')
+        if not isinstance(seasons, list):
+            _add_error(errors, f'{item_field}.seasons', 'liste olmalı')
+            seasons = []
+        normalized_seasons = []
+        for season in seasons:
+            interned = SEASONS.get(season.lower()) if isinstance(season, str) else None
+            if interned is None:
+                _add_error(errors, f'{item_field}.seasons', f'geçersiz mevsim: {season!r}')
+                continue
+            normalized_seasons.append(interned)
+        normalized['seasons'] = normalized_seasons
+
+        colors = item.get('colors')
+        if not isinstance(colors, list):
+            _add_error(errors, f'{item_field}.colors', 'liste olmalı')
+            colors = []
+        normalized_colors = []
+        for color in colors:
+            color = color.lower() if isinstance(color, str) else color
+            if not isinstance(color, str) or not COLOR_PATTERN.fullmatch(color):
+                _add_error(errors, f'{item_field}.colors', f'geçersiz renk (#rrggbb bekleniyor): {color!r}')
+                continue
+            normalized_colors.append(color)
+        normalized['colors'] = normalized_colors
+
+        normalized_items.append(normalized)
+    return normalized_items
+
+
+def normalize_weather(weather, field='weather'):
+    """Hava durumunu doğrula ve normalize et; hatalıysa RequestValidationError"""
+    errors = []
+    normalized = _normalize_weather(weather, field, errors)
+    if errors:
+        raise RequestValidationError(errors)
+    return normalized
+
+
+def normalize_items(items, field='userClothingItems'):
+    """Kıyafet listesini doğrula ve normalize et; hatalıysa RequestValidationError"""
+    errors = []
+    normalized = _normalize_items(items, field, errors)
+    if errors:
+        raise RequestValidationError(errors)
+    return normalized
+
+
+def validate_recommend_request(data):
+    """Öneri isteğini tek geçişte doğrula: (user_id, weather, user_clothing_items) döndürür"""
+    errors = []
+    if not isinstance(data, dict):
+        raise RequestValidationError([{'field': '', 'message': 'JSON nesnesi bekleniyor'}])
+
+    user_id = data.get('userId')
+    if user_id is not None and not isinstance(user_id, str):
+        _add_error(errors, 'userId', 'metin olmalı')
+
+    weather = _normalize_weather(data.get('weather'), 'weather', errors)
+    user_clothing_items = _normalize_items(data.get('userClothingItems', []), 'userClothingItems', errors)
+
+    if errors:
+        raise RequestValidationError(errors)
+    return user_id, weather, user_clothing_items